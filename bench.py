@@ -0,0 +1,883 @@
+# bench.py
+"""Lee benchmark'ları (ekran ve gerçek servis gerekmez).
+
+    python bench.py engine --turns 5000
+    python bench.py router --reps 2000
+    python bench.py textnorm --reps 200
+    python bench.py weather|notes|chat|voice --turns 200
+    python bench.py offline --turns 12
+    python bench.py server --sessions 100 --turns 5
+    python bench.py suite --out results.json
+    python bench.py compare eski.json yeni.json
+
+Ağ gerektiren senaryolar Ollama ve Open-Meteo yerine yerel sahte sunucularla
+(FakeOllama, FakeOpenMeteo), ses ise sahte edge_tts/pygame ve recognizer ile
+çalışır; gecikmeler ve token hızı parametreyle ayarlanır. Her senaryo tek
+satır JSON basar (tur/sn, gecikme yüzdelikleri, tepe RSS). suite her senaryoyu
+ayrı süreçte çalıştırır ki tepe RSS birbirine karışmasın.
+
+Turların hepsi yedek cevaba düştüyse ya da sahte sunucu hiç istek almadıysa
+(ör. requests kurulu değil) sonuç yine basılır ama çıkış kodu 1 olur.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlsplit
+
+import lee_core
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Karışık bir oturum: hızlı niyetler + hava + LLM'e düşen sohbet
+TRANSCRIPT = [
+    "saat kaç",
+    "İstanbul hava durumu",
+    "not al: süt al",
+    "bugün günlerden ne",
+    "notlar",
+    "bana kısa bir fıkra anlat",
+    "Ankara hava tahmini",
+    "tarih ne",
+    "notları yenile",
+    "python'da liste ile tuple farkı ne",
+]
+
+def stub_weather(city: str) -> str:
+    return f"{city} için bugün: en düşük 5 derece, en yüksek 14 derece. Yağış olasılığı yüzde 20."
+
+def stub_llm(user_text: str, history: list[dict]) -> str:
+    return "Kısaca anlatayım: bu konuda iki temel nokta var ve ikisi de basit. ✨"
+
+class StubTtsSink:
+    """TTS yerine geçer: metin temizliği gerçek, sentez/çalma yok."""
+
+    def __init__(self):
+        self.events = 0
+        self.spoken_chars = 0
+
+    def emit(self, event):
+        self.events += 1
+        if event.kind == "reply":
+            self.spoken_chars += len(lee_core.tts_clean(event.data["speech"]))
+
+def percentiles(samples: list[float]) -> dict:
+    if not samples:
+        return {}
+    xs = sorted(samples)
+
+    def pct(p):
+        return round(lee_core.percentile(xs, p), 2)
+
+    return {"n": len(xs), "p50": pct(50), "p90": pct(90), "p99": pct(99),
+            "mean": round(sum(xs) / len(xs), 2), "max": round(xs[-1], 2)}
+
+def peak_rss_kb() -> int | None:
+    """Sürecin tepe RSS'i (KB). resource modülü yoksa None."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+# =========================
+# Yerel sahte servisler
+# =========================
+class _QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256   # varsayılan 5; yük altında SYN düşüp 1 sn beklemesin
+
+    def handle_error(self, request, client_address):
+        # istemci havuzu bağlantıyı kapatınca gelen reset'ler gürültü
+        pass
+
+class _FakeServer:
+    """Arka plan thread'inde çalışan ThreadingHTTPServer; url ile adresi verir."""
+
+    def __init__(self, handler):
+        self.httpd = _QuietHTTPServer(("127.0.0.1", 0), handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.requests = 0
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # başlık ve gövde ayrı yazılıyor; Nagle + delayed ACK her isteğe ~40 ms eklemesin
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, obj):
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class FakeOllama(_FakeServer):
+    """/api/chat taklidi: `latency_ms` sonra ilk parça, ardından `token_rate` parça/sn.
+    /api/tags (sağlık yoklaması) hemen cevap verir."""
+
+    REPLY = ("Kısaca anlatayım: bu konuda iki temel nokta var. Birincisi basitlik, "
+             "ikincisi de tutarlılık. İstersen örnekle açayım.").split(" ")
+
+    def __init__(self, latency_ms=50.0, token_rate=200.0):
+        self.latency_ms = latency_ms
+        self.token_rate = token_rate
+        server = self
+
+        class Handler(_Handler):
+            def do_GET(self):
+                self._json({"models": [{"name": lee_core.OLLAMA_MODEL}]})
+
+            def do_POST(self):
+                req = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                server.requests += 1
+                time.sleep(server.latency_ms / 1000)
+                words = [w + " " for w in server.REPLY]
+                if not req.get("stream"):
+                    time.sleep(len(words) / server.token_rate)
+                    return self._json({"message": {"role": "assistant", "content": "".join(words)},
+                                       "done": True})
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for i, w in enumerate(words):
+                    if i:
+                        time.sleep(1 / server.token_rate)
+                    self._chunk({"message": {"role": "assistant", "content": w}, "done": False})
+                self._chunk({"message": {"role": "assistant", "content": ""}, "done": True})
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _chunk(self, obj):
+                line = json.dumps(obj).encode("utf-8") + b"\n"
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                self.wfile.flush()
+
+        super().__init__(Handler)
+
+class FakeOpenMeteo(_FakeServer):
+    """Geocoding (/v1/search) ve tahmin (/v1/forecast) taklidi, `latency_ms` gecikmeli."""
+
+    def __init__(self, latency_ms=20.0):
+        self.latency_ms = latency_ms
+        server = self
+
+        class Handler(_Handler):
+            def do_GET(self):
+                url = urlsplit(self.path)
+                q = parse_qs(url.query)
+                server.requests += 1
+                time.sleep(server.latency_ms / 1000)
+                if url.path == "/v1/search":
+                    name = (q.get("name") or ["?"])[0]
+                    return self._json({"results": [{"name": name, "latitude": 39.9, "longitude": 32.8}]})
+                return self._json({"daily": {"temperature_2m_max": [14.2],
+                                             "temperature_2m_min": [5.1],
+                                             "precipitation_probability_max": [20]}})
+
+        super().__init__(Handler)
+
+    @property
+    def geocode_url(self):
+        return self.url + "/v1/search"
+
+    @property
+    def forecast_url(self):
+        return self.url + "/v1/forecast"
+
+def use_fake_services(ollama: FakeOllama, meteo: FakeOpenMeteo):
+    lee_core.OLLAMA_URL = ollama.url
+    lee_core.GEOCODE_URL = meteo.geocode_url
+    lee_core.FORECAST_URL = meteo.forecast_url
+
+# =========================
+# Sahte ses arka uçları
+# =========================
+class FakeMicrophone:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+class FakeRecognizer:
+    """speech_recognition.Recognizer taklidi: sıradaki ifadeyi gecikmeyle "duyar"."""
+
+    def __init__(self, utterances: list[str], listen_ms=5.0, recognize_ms=20.0):
+        self.utterances = utterances
+        self.listen_ms = listen_ms
+        self.recognize_ms = recognize_ms
+        self._i = 0
+
+    def adjust_for_ambient_noise(self, source, duration=0.25):
+        pass
+
+    def listen(self, source, phrase_time_limit=None):
+        time.sleep(self.listen_ms / 1000)
+        text = self.utterances[self._i % len(self.utterances)]
+        self._i += 1
+        return text
+
+    def recognize_google(self, audio, language=None):
+        time.sleep(self.recognize_ms / 1000)
+        return audio
+
+def fake_tts_backend(ms_per_char=0.5, play_ms=0.0):
+    """(edge_tts, pygame) taklidi: sentez karakter başına, çalma sabit süre tutar."""
+
+    class Communicate:
+        def __init__(self, text, voice):
+            self.text = text
+
+        async def save(self, filename):
+            await asyncio.sleep(len(self.text) * ms_per_char / 1000)
+            Path(filename).write_bytes(b"\0" * len(self.text))
+
+    class Music:
+        _until = 0.0
+
+        def load(self, filename):
+            pass
+
+        def play(self):
+            self._until = time.monotonic() + play_ms / 1000
+
+        def get_busy(self):
+            return time.monotonic() < self._until
+
+        def stop(self):
+            self._until = 0.0
+
+    edge_tts = SimpleNamespace(Communicate=Communicate)
+    pygame = SimpleNamespace(mixer=SimpleNamespace(init=lambda: None, music=Music()))
+    return edge_tts, pygame
+
+@contextmanager
+def fake_world(args, utterances=TRANSCRIPT):
+    """Sahte Ollama/Open-Meteo/STT/TTS'i kurar; notlar geçici dizinde tutulur."""
+    ollama = FakeOllama(latency_ms=args.ollama_latency_ms, token_rate=args.token_rate)
+    meteo = FakeOpenMeteo(latency_ms=args.meteo_latency_ms)
+    use_fake_services(ollama, meteo)
+    lee_core.STT = lee_core.Subsystem("stt", lambda: (
+        FakeRecognizer(utterances, recognize_ms=args.stt_ms), FakeMicrophone()))
+    lee_core.TTS = lee_core.Subsystem("tts", lambda: fake_tts_backend(args.tts_ms_per_char))
+    try:
+        with tempfile.TemporaryDirectory() as d:
+            lee_core.NOTES_FILE = Path(d) / "notes.txt"
+            yield SimpleNamespace(ollama=ollama, meteo=meteo)
+    finally:
+        ollama.close()
+        meteo.close()
+
+# =========================
+# Senaryolar
+# =========================
+def _result(name: str, args, turn_ms: list[float], elapsed: float, **extra) -> dict:
+    return {
+        "bench": name,
+        "turns": len(turn_ms),
+        "seconds": round(elapsed, 4),
+        "turns_per_sec": round(len(turn_ms) / elapsed, 1) if elapsed else None,
+        "turn_ms": percentiles(turn_ms),
+        "rss_peak_kb": peak_rss_kb(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("bench", "func")},
+        **extra,
+    }
+
+def _run_turns(engine, utterances: list[str], turns: int) -> tuple[list[float], float, Counter, int]:
+    lat, intents, degraded = [], Counter(), 0
+    t0 = time.perf_counter()
+    for i in range(turns):
+        t = time.perf_counter()
+        resp = engine.handle(utterances[i % len(utterances)])
+        lat.append((time.perf_counter() - t) * 1000)
+        intents[resp.intent] += 1
+        degraded += _degraded(resp.text)
+    return lat, time.perf_counter() - t0, intents, degraded
+
+def _degraded(text: str) -> bool:
+    """Servis yerine yedek/hata cevabı mı döndü (ölçülen şey sahte sunucu değil)."""
+    return any(m in text for m in ("ulaşamıyorum", "alamadım", "bağlanamadım"))
+
+def _check(result: dict) -> list[str]:
+    """Ölçümü geçersiz kılan durumlar: her tur yedeğe düştüyse ya da sahte
+    sunucu hiç istek görmediyse sayılar servisi değil hata yolunu ölçer."""
+    problems = []
+    if result.get("turns") and result.get("degraded") == result["turns"]:
+        problems.append(f"{result['bench']}: {result['turns']} turun hepsi yedek cevaba düştü")
+    for key in ("meteo_requests", "ollama_requests"):
+        if result.get(key) == 0:
+            problems.append(f"{result['bench']}: sahte sunucu hiç istek almadı ({key})")
+    warm = result.get("phases", {}).get("warm")
+    if warm and warm["degraded"] == warm["turns"]:
+        problems.append(f"{result['bench']}: sağlıklı ısınma turlarının hepsi yedek cevaba düştü")
+    for name in result.get("failed", ()):
+        problems.append(f"suite: {name} geçersiz")
+    return problems
+
+def bench_engine(args) -> dict:
+    """Sadece niyet mantığı: hava, LLM ve TTS stub."""
+    sink = StubTtsSink()
+    with tempfile.TemporaryDirectory() as d:
+        lee_core.NOTES_FILE = Path(d) / "notes.txt"
+        engine = lee_core.AssistantEngine(weather=stub_weather, llm=stub_llm, sinks=[sink])
+        lat, elapsed, intents, degraded = _run_turns(engine, TRANSCRIPT, args.turns)
+    return _result("engine", args, lat, elapsed, events=sink.events, intents=dict(intents),
+                   degraded=degraded)
+
+def bench_weather(args) -> dict:
+    cities = ["İstanbul", "Ankara", "İzmir", "Kahramanmaraş", "Trabzon"]
+    with fake_world(args) as w:
+        engine = lee_core.AssistantEngine()
+        lat, elapsed, _, degraded = _run_turns(engine, [f"{c} hava durumu" for c in cities], args.turns)
+    return _result("weather", args, lat, elapsed, degraded=degraded, meteo_requests=w.meteo.requests)
+
+def bench_notes(args) -> dict:
+    with fake_world(args):
+        engine = lee_core.AssistantEngine()
+        lat, elapsed, intents, _ = _run_turns(engine, ["not al: ekmek al", "notlar"], args.turns)
+    return _result("notes", args, lat, elapsed, intents=dict(intents))
+
+def bench_chat(args) -> dict:
+    prompts = ["bana kısa bir fıkra anlat", "python'da liste ile tuple farkı ne", "merhaba nasılsın"]
+    with fake_world(args) as w:
+        engine = lee_core.AssistantEngine()
+        lat, elapsed, _, degraded = _run_turns(engine, prompts, args.turns)
+    return _result("chat", args, lat, elapsed, degraded=degraded, ollama_requests=w.ollama.requests)
+
+def bench_voice(args) -> dict:
+    """Ses patlaması: STT art arda ifade duyar, her tur kendi thread'inde işlenir
+    (uygulamadaki gibi), cevaplar tek TTS kilidiyle sırayla seslendirilir.
+    Gecikme: ifadenin duyulmasından seslendirmenin bitmesine kadar."""
+    with fake_world(args) as w:
+        recognizer, mic = lee_core.STT.get()
+        engine = lee_core.AssistantEngine()
+        tts_lock = threading.Lock()
+        lat, degraded = [], []
+
+        def turn(heard: str, t_heard: float):
+            resp = engine.handle(heard)
+            if _degraded(resp.text):
+                degraded.append(heard)
+            clean = lee_core.tts_clean(resp.speech)
+            if clean:
+                with tts_lock:
+                    lee_core.play_speech(clean, engine.voice)
+            lat.append((time.perf_counter() - t_heard) * 1000)
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            for _ in range(args.turns):
+                heard = lee_core.stt_listen(recognizer, mic)
+                if heard:
+                    pool.submit(turn, heard, time.perf_counter())
+        elapsed = time.perf_counter() - t0
+    return _result("voice", args, lat, elapsed, degraded=len(degraded),
+                   ollama_requests=w.ollama.requests, meteo_requests=w.meteo.requests)
+
+# =========================
+# Servis kesintisi
+# =========================
+def _phase(engine, utterances: list[str], turns: int) -> dict:
+    lat, degraded = [], 0
+    for i in range(turns):
+        t = time.perf_counter()
+        resp = engine.handle(utterances[i % len(utterances)])
+        lat.append((time.perf_counter() - t) * 1000)
+        degraded += _degraded(resp.text)
+    return {"turns": turns, "turn_ms": percentiles(lat), "degraded": degraded,
+            "services": lee_core.service_states()}
+
+def bench_offline(args) -> dict:
+    """Servis kesintisi: sağlıklı ısınma -> Open-Meteo takılıyor -> iki servis
+    de kapalı (bağlantı reddi) -> servisler geri geliyor. Kesici açıldıktan
+    sonra turlar ağa çıkmadan ms içinde, önbellekteki ya da yedek cevapla
+    dönmeli; yoklama servisler dönünce kesicileri kendisi kapatmalı."""
+    mix = ["Ankara hava durumu", "bana kısa bir fıkra anlat", "İzmir hava durumu",
+           "python'da liste ile tuple farkı ne"]
+    with fake_world(args) as w:
+        engine = lee_core.AssistantEngine()
+        t0 = time.perf_counter()
+        out = {"warm": _phase(engine, mix, args.turns)}
+
+        w.meteo.latency_ms = args.hang_s * 1000
+        out["meteo_hung"] = _phase(engine, mix[::2], args.turns)
+
+        w.ollama.close()
+        w.meteo.close()
+        out["down"] = _phase(engine, mix, args.turns)
+
+        ollama = FakeOllama(latency_ms=args.ollama_latency_ms, token_rate=args.token_rate)
+        meteo = FakeOpenMeteo(latency_ms=args.meteo_latency_ms)
+        use_fake_services(ollama, meteo)
+        lee_core.MONITOR.start()
+        t = time.perf_counter()
+        while any(s != lee_core.Service.CLOSED for s in lee_core.service_states().values()):
+            if time.perf_counter() - t > 4 * lee_core.PROBE_DOWN_S:
+                break
+            time.sleep(0.05)
+        out["recovery_s"] = round(time.perf_counter() - t, 2)
+        out["recovered"] = _phase(engine, mix, args.turns)
+        lee_core.MONITOR.stop()
+        ollama.close()
+        meteo.close()
+        elapsed = time.perf_counter() - t0
+    return {"bench": "offline", "seconds": round(elapsed, 2),
+            "turn_ms": out["down"]["turn_ms"], "rss_peak_kb": peak_rss_kb(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("bench", "func")},
+            "phases": out}
+
+# =========================
+# Sunucu yük testi
+# =========================
+SERVER_MIX = [
+    "İzmir hava durumu",
+    "bana kısa bir fıkra anlat",
+    "saat kaç",
+    "python'da liste ile tuple farkı ne",
+    "Ankara hava tahmini",
+]
+
+async def _chat_turn(reader, writer, session: str | None, text: str) -> tuple[str, str, str]:
+    body = json.dumps({"session": session, "text": text}).encode("utf-8")
+    writer.write(b"POST /chat HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n"
+                 b"Content-Length: %d\r\n\r\n%s" % (len(body), body))
+    await writer.drain()
+    while (await reader.readline()) not in (b"\r\n", b""):
+        pass
+    sid, intent, reply = session, "", ""
+    while True:
+        n = int((await reader.readline()).strip(), 16)
+        if n == 0:
+            await reader.readline()
+            return sid, intent, reply
+        msg = json.loads(await reader.readexactly(n))
+        await reader.readline()
+        sid = msg.get("session", sid)
+        if msg["type"] == "done":
+            intent, reply = msg["intent"], msg["text"]
+
+async def _load_client(port: int, turns: int, rng: random.Random, lat: dict, degraded: Counter):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    sid = None
+    try:
+        for _ in range(turns):
+            t0 = time.perf_counter()
+            sid, intent, reply = await _chat_turn(reader, writer, sid, rng.choice(SERVER_MIX))
+            lat[intent].append((time.perf_counter() - t0) * 1000)
+            degraded[intent] += _degraded(reply)
+    finally:
+        writer.close()
+
+async def _bench_server(args, ollama, meteo) -> dict:
+    import lee_server
+
+    app = lee_server.LeeServer(ollama_concurrency=args.ollama_concurrency)
+    server = await app.start("127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    rng = random.Random(1)
+    lat, degraded = defaultdict(list), Counter()
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(_load_client(port, args.turns, random.Random(rng.random()), lat, degraded)
+                           for _ in range(args.sessions)))
+    elapsed = time.perf_counter() - t0
+    server.close()
+    app.pool.shutdown(wait=False)
+
+    all_ms = [x for xs in lat.values() for x in xs]
+    return _result("server", args, all_ms, elapsed,
+                   turn_ms_by_intent={k: percentiles(v) for k, v in sorted(lat.items())},
+                   degraded=sum(degraded.values()), degraded_by_intent=dict(degraded),
+                   ollama_requests=ollama.requests, meteo_requests=meteo.requests)
+
+# =========================
+# Niyet yönlendirme
+# =========================
+# (cümle, beklenen niyet) — gerçek oturumlardan derlenmiş, zor örnekler dahil
+LABELED = [
+    ("saat kaç", "time"),
+    ("şu an saat kaç acaba", "time"),
+    ("Saat kaç oldu?", "time"),
+    ("tarih ne", "date"),
+    ("bugün", "date"),
+    ("bugün günlerden ne", "date"),
+    ("bugünün tarihi ne", "date"),
+    ("İstanbul hava durumu", "weather"),
+    ("Ankara hava tahmini", "weather"),
+    ("yarın İzmir'de hava nasıl olacak", "weather"),
+    ("hava nasıl", "weather"),
+    ("ŞANLIURFA HAVA DURUMU", "weather"),
+    ("İstanbul'un havası nasıl", "weather"),
+    ("yarın havalar nasıl olacak", "weather"),
+    ("saati söyler misin", "time"),
+    ("saatin kaç", "time"),
+    ("not al: süt al", "note_add"),
+    ("not al ekmek ve yumurta", "note_add"),
+    ("not al: yarın saat 5'te toplantı var", "note_add"),
+    ("not al: hava güzelse pikniğe git", "note_add"),
+    ("not al: notları silmeyi unutma", "note_add"),
+    ("notlar", "notes_list"),
+    ("notlarımı göster", "notes_list"),
+    ("notlarımda ne var", "notes_list"),
+    ("notları sil", "notes_clear"),
+    ("tüm notları sil", "notes_clear"),
+    ("NOTLARI SİL", "notes_clear"),
+    ("notlari sil", "notes_clear"),
+    ("güncelle", "notes_refresh"),
+    ("notları yenile", "notes_refresh"),
+    ("notları güncelle", "notes_refresh"),
+    ("kapat", "exit"),
+    ("çık", "exit"),
+    ("quit", "exit"),
+    ("yardım", "help"),
+    ("komutlar neler", "help"),
+    ("merhaba nasılsın", "chat"),
+    ("bana kısa bir fıkra anlat", "chat"),
+    ("python'da liste ile tuple farkı ne", "chat"),
+    ("saatlerce çalıştım çok yoruldum", "chat"),
+    ("havalimanına nasıl giderim", "chat"),
+    ("saat kulesinin tarihi hakkında bilgi ver", "chat"),
+    ("kaç saat uyumalıyım", "chat"),
+    ("tarih dersine çalışmam lazım", "chat"),
+    ("yarın havanın nasıl olacağını söyle", "weather"),
+    ("karşıda hava nasıl", "weather"),
+    ("kahve mi çay mı", "chat"),
+    ("bugün çok güzel bir gün", "chat"),
+    ("notebook önerir misin", "chat"),
+]
+
+def legacy_route(text: str) -> str:
+    """Eski handle_text if-zincirinin niyet kararı (karşılaştırma için)."""
+    t = lee_core.normalize(text)
+    if ("notları sil" in t) or ("notlari sil" in t) or ("tüm notları sil" in t) or ("tum notlari sil" in t):
+        return "notes_clear"
+    if (t == "güncelle") or (t == "guncelle") or ("notları güncelle" in t) or ("notlari guncelle" in t) or ("notları yenile" in t) or ("notlari yenile" in t):
+        return "notes_refresh"
+    if "hava" in t or "tahmin" in t:
+        lee_core.find_city_in_text(text)
+        return "weather"
+    if "saat" in t:
+        return "time"
+    if "tarih" in t or t == "bugün" or "bugün günlerden" in t:
+        return "date"
+    if "not al" in t:
+        return "note_add"
+    if "notlar" in t:
+        return "notes_list"
+    if t in ["kapat", "çık", "bitir", "exit", "quit"]:
+        return "exit"
+    if "yardım" in t or "komut" in t:
+        return "help"
+    return "chat"
+
+def bench_router(args) -> dict:
+    """Yönlendirme maliyeti (slot çıkarımı dahil) ve etiketli kümede doğruluk."""
+    texts = [t for t, _ in LABELED]
+    out = {"bench": "router", "utterances": len(texts), "reps": args.reps}
+    for name, fn in [("router", lambda t: lee_core.ROUTER.route(t).intent), ("legacy", legacy_route)]:
+        t0 = time.perf_counter()
+        for _ in range(args.reps):
+            for t in texts:
+                fn(t)
+        elapsed = time.perf_counter() - t0
+        wrong = [(t, want, got) for t, want in LABELED if (got := fn(t)) != want]
+        out[name] = {
+            "us_per_utterance": round(elapsed / (args.reps * len(texts)) * 1e6, 3),
+            "accuracy": round(1 - len(wrong) / len(LABELED), 3),
+            "misrouted": [{"text": t, "want": w, "got": g} for t, w, g in wrong],
+        }
+    out["rss_peak_kb"] = peak_rss_kb()
+    return out
+
+# =========================
+# Metin normalizasyonu
+# =========================
+def legacy_tts_clean(text: str) -> str:
+    """Eski tts_clean: her çağrıda regex derleme + 9 replace + boşluk regex'i."""
+    if not text:
+        return ""
+    emoji_re = re.compile(
+        "["
+        "\U0001F300-\U0001F5FF"
+        "\U0001F600-\U0001F64F"
+        "\U0001F680-\U0001F6FF"
+        "\U0001F700-\U0001F77F"
+        "\U0001F780-\U0001F7FF"
+        "\U0001F800-\U0001F8FF"
+        "\U0001F900-\U0001F9FF"
+        "\U0001FA00-\U0001FA6F"
+        "\U0001FA70-\U0001FAFF"
+        "\U00002700-\U000027BF"
+        "\U00002600-\U000026FF"
+        "]+",
+        flags=re.UNICODE
+    )
+    text = emoji_re.sub("", text)
+    for ch in ["•", "✅", "✨", "🤖", "☕", "💜", "😄", "😊", "😅"]:
+        text = text.replace(ch, "")
+    return re.sub(r"\s+", " ", text).strip()
+
+def legacy_turkish_fold(s: str) -> str:
+    s = lee_core.normalize(s)
+    return (s.replace("ı", "i").replace("ğ", "g").replace("ş", "s")
+             .replace("ö", "o").replace("ü", "u").replace("ç", "c").replace("\u0307", ""))
+
+def legacy_find_city(text: str) -> str | None:
+    t = legacy_turkish_fold(text)
+    for city in sorted(lee_core.TURKEY_CITIES, key=len, reverse=True):
+        if legacy_turkish_fold(city) in t:
+            return city
+    return None
+
+def long_replies(n: int, words: int, seed=7) -> list[str]:
+    """LLM'e benzeyen uzun, emojili, maddeli Türkçe cevaplar."""
+    rng = random.Random(seed)
+    vocab = ("Şüphesiz bugün İstanbul'da güneşli ve ılık bir gün olacak çünkü "
+             "yüksek basınç sistemi Ege üzerinden geliyor ama akşama doğru "
+             "rüzgâr artabilir öğleden sonra kısa sağanaklar görülebilir").split()
+    extras = ["😊", "✨", "🤖", "☕", "•", "\n", "\n\n", "  ", "✅", "💜"]
+    out = []
+    for _ in range(n):
+        parts = []
+        for _ in range(words):
+            parts.append(rng.choice(vocab))
+            if rng.random() < 0.08:
+                parts.append(rng.choice(extras))
+        out.append(" ".join(parts))
+    return out
+
+def _us_per_call(fn, items, reps) -> float:
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        for x in items:
+            fn(x)
+    return (time.perf_counter() - t0) / (reps * len(items)) * 1e6
+
+# kelime içindeki şehir adları (havanın -> Van, karşıda -> Kars) şehir değildir
+CITY_LABELED = [
+    ("yarın İzmir'de hava nasıl olacak", "İzmir"),
+    ("istanbulun havası nasıl", "İstanbul"),
+    ("ankarada yağmur var mı", "Ankara"),
+    ("Kars'ta kar yağıyor mu", "Kars"),
+    ("Van hava durumu", "Van"),
+    ("Kahramanmaraş için hava tahmini", "Kahramanmaraş"),
+    ("yarın havanın nasıl olacağını söyle", None),
+    ("karşıda hava nasıl", None),
+    ("vanilyalı dondurma tarifi ver", None),
+    ("hava nasıl", None),
+]
+
+def _city_accuracy(find) -> float:
+    return round(sum(find(t) == c for t, c in CITY_LABELED) / len(CITY_LABELED), 3)
+
+def bench_textnorm(args) -> dict:
+    """Uzun LLM cevaplarında tts_clean/turkish_fold ve şehir aramasında eski vs yeni."""
+    replies = long_replies(50, args.words)
+    utterances = [t for t, _ in LABELED]
+    uncached = lee_core.normalize_text.__wrapped__
+
+    def new_both(x):
+        n = uncached(x)
+        return n.folded, n.tts
+
+    def legacy_both(x):
+        return legacy_turkish_fold(x), legacy_tts_clean(x)
+
+    out = {"bench": "textnorm", "reply_chars_mean": sum(map(len, replies)) // len(replies), "reps": args.reps}
+    legacy = _us_per_call(legacy_both, replies, args.reps)
+    new = _us_per_call(new_both, replies, args.reps)
+    lee_core.normalize_text.cache_clear()
+    cached = _us_per_call(lee_core.normalize_text, replies, args.reps)
+    out["reply_fold_and_clean_us"] = {
+        "legacy": round(legacy, 2), "new": round(new, 2), "new_cached": round(cached, 2),
+        "speedup": round(legacy / new, 2), "speedup_cached": round(legacy / cached, 2),
+        "identical": all(legacy_both(x) == new_both(x) for x in replies),
+    }
+
+    lee_core.normalize_text.cache_clear()
+    legacy = _us_per_call(legacy_find_city, utterances, args.reps)
+    new = _us_per_call(lee_core.find_city_in_text, utterances, args.reps)
+    out["find_city_us"] = {
+        "legacy": round(legacy, 2), "new": round(new, 2), "speedup": round(legacy / new, 2),
+        "legacy_accuracy": _city_accuracy(legacy_find_city),
+        "accuracy": _city_accuracy(lee_core.find_city_in_text),
+    }
+    out["rss_peak_kb"] = peak_rss_kb()
+    return out
+
+def bench_server(args) -> dict:
+    with fake_world(args) as w:
+        result = asyncio.run(_bench_server(args, w.ollama, w.meteo))
+    return result
+
+# =========================
+# Suite / karşılaştırma
+# =========================
+SUITE = ["engine", "router", "textnorm", "weather", "notes", "chat", "voice", "offline", "server"]
+
+def run_suite(args) -> dict:
+    results, failed = [], []
+    for name in args.only or SUITE:
+        cmd = [sys.executable, __file__, name] + _world_argv(args)
+        if name == "server":
+            cmd += ["--sessions", str(args.sessions), "--turns", str(args.server_turns)]
+        elif name in ("router", "textnorm"):
+            cmd = [sys.executable, __file__, name]
+        elif args.turns:
+            cmd += ["--turns", str(args.turns)]
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        if not proc.stdout.strip():
+            raise subprocess.CalledProcessError(proc.returncode, cmd, proc.stdout, proc.stderr)
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+        if proc.returncode:
+            failed.append(name)
+            sys.stderr.write(proc.stderr)
+    suite = {
+        "bench": "suite",
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+        "failed": failed,
+    }
+    if args.out:
+        Path(args.out).write_text(json.dumps(suite, ensure_ascii=False, indent=2), encoding="utf-8")
+    return suite
+
+COMPARE_METRICS = [
+    ("turns_per_sec", ("turns_per_sec",)),
+    ("p50_ms", ("turn_ms", "p50")),
+    ("p99_ms", ("turn_ms", "p99")),
+    ("router_us", ("router", "us_per_utterance")),
+    ("fold_and_clean_us", ("reply_fold_and_clean_us", "new")),
+    ("find_city_us", ("find_city_us", "new")),
+    ("rss_peak_kb", ("rss_peak_kb",)),
+]
+
+def _metric(result: dict, path: tuple[str, ...]):
+    for key in path:
+        if not isinstance(result, dict):
+            return None
+        result = result.get(key)
+    return result
+
+def compare(args) -> dict:
+    """İki suite çıktısını senaryo senaryo karşılaştırır (yeni/eski oranı)."""
+    old = {r["bench"]: r for r in json.loads(Path(args.old).read_text(encoding="utf-8"))["results"]}
+    new = {r["bench"]: r for r in json.loads(Path(args.new).read_text(encoding="utf-8"))["results"]}
+    rows = {}
+    for name in old.keys() & new.keys():
+        a, b = old[name], new[name]
+        row = {}
+        # router/textnorm tur ölçmez (turn_ms yok); onlarda µs/çağrı karşılaştırılır
+        for key, path in COMPARE_METRICS:
+            va, vb = _metric(a, path), _metric(b, path)
+            if va is None and vb is None:
+                continue
+            row[key] = {"old": va, "new": vb, "ratio": round(vb / va, 3) if va and vb else None}
+        rows[name] = row
+    return {"bench": "compare", "old": args.old, "new": args.new, "scenarios": rows}
+
+def _add_world_args(p):
+    p.add_argument("--ollama-latency-ms", type=float, default=50.0, help="sahte Ollama ilk parça gecikmesi")
+    p.add_argument("--token-rate", type=float, default=200.0, help="sahte Ollama parça/sn")
+    p.add_argument("--meteo-latency-ms", type=float, default=20.0, help="sahte Open-Meteo istek gecikmesi")
+    p.add_argument("--stt-ms", type=float, default=20.0, help="sahte tanıma süresi")
+    p.add_argument("--tts-ms-per-char", type=float, default=0.5, help="sahte sentez süresi / karakter")
+
+def _world_argv(args) -> list[str]:
+    return ["--ollama-latency-ms", str(args.ollama_latency_ms), "--token-rate", str(args.token_rate),
+            "--meteo-latency-ms", str(args.meteo_latency_ms), "--stt-ms", str(args.stt_ms),
+            "--tts-ms-per-char", str(args.tts_ms_per_char)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Lee benchmark'ları")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    for name, func, turns, help_ in [
+        ("engine", bench_engine, 5000, "GUI'siz AssistantEngine tur/sn (hava, LLM, TTS stub)"),
+        ("weather", bench_weather, 200, "hava niyeti, sahte Open-Meteo"),
+        ("notes", bench_notes, 1000, "not al / notlar"),
+        ("chat", bench_chat, 100, "LLM sohbeti, sahte Ollama"),
+        ("voice", bench_voice, 100, "art arda sesli giriş: STT -> motor -> TTS"),
+    ]:
+        p = sub.add_parser(name, help=help_)
+        p.add_argument("--turns", type=int, default=turns)
+        _add_world_args(p)
+        p.set_defaults(func=func)
+
+    p = sub.add_parser("router", help="niyet yönlendirme maliyeti ve doğruluğu")
+    p.add_argument("--reps", type=int, default=2000)
+    p.set_defaults(func=bench_router)
+
+    p = sub.add_parser("textnorm", help="metin normalizasyonu: eski vs yeni, uzun LLM cevapları")
+    p.add_argument("--reps", type=int, default=200)
+    p.add_argument("--words", type=int, default=600, help="cevap başına kelime")
+    p.set_defaults(func=bench_textnorm)
+
+    p = sub.add_parser("offline", help="servis kesintisi: kesici, yedek cevap, yoklamayla dönüş")
+    p.add_argument("--turns", type=int, default=12, help="aşama başına tur")
+    p.add_argument("--hang-s", type=float, default=30.0, help="takılan Open-Meteo'nun cevap süresi")
+    _add_world_args(p)
+    p.set_defaults(func=bench_offline)
+
+    p = sub.add_parser("server", help="lee_server yük testi (sahte Ollama/Open-Meteo)")
+    p.add_argument("--sessions", type=int, default=100)
+    p.add_argument("--turns", type=int, default=5, help="oturum başına tur")
+    p.add_argument("--ollama-concurrency", type=int, default=4)
+    _add_world_args(p)
+    p.set_defaults(func=bench_server)
+
+    p = sub.add_parser("suite", help="tüm senaryolar, her biri ayrı süreçte")
+    p.add_argument("--out", help="sonuç JSON dosyası")
+    p.add_argument("--only", nargs="+", choices=SUITE, help="sadece bu senaryolar")
+    p.add_argument("--turns", type=int, help="senaryo başına tur (varsayılan: senaryonun kendi)")
+    p.add_argument("--sessions", type=int, default=100, help="server senaryosu oturum sayısı")
+    p.add_argument("--server-turns", type=int, default=5, help="server senaryosu oturum başına tur")
+    _add_world_args(p)
+    p.set_defaults(func=run_suite)
+
+    p = sub.add_parser("compare", help="iki suite çıktısını karşılaştır")
+    p.add_argument("old")
+    p.add_argument("new")
+    p.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    result = args.func(args)
+    print(json.dumps(result, ensure_ascii=False))
+    problems = _check(result)
+    if problems:
+        print("\n".join(problems), file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -6,210 +6,34 @@ import datetime
 from pathlib import Path
 import time
 import os
-import tempfile
-import asyncio
 import math
 import random
-import re
+import sys
+from concurrent.futures import wait
 
-import speech_recognition as sr
-import edge_tts
-import pygame
-import requests
+# motor ve servisler Tk'siz çekirdekte (sunucu ve bench ekransız kullanır)
+from lee_core import (
+    DEFAULT_CITY, HELP_TEXT, HTTP, MONITOR, PROFILER, SERVICES, STT, TRACE_FILE, TRACER, TTS,
+    TURKEY_CITIES, VOICE_FEMALE, VOICE_MALE, AssistantEngine, Event, clear_notes, play_speech,
+    read_notes_last, service_status_text, start_subsystems, stt_listen, tr_day_name, trace_report,
+    tts_clean,
+)
 
 # =========================
-# Config
-# =========================
-NOTES_FILE = Path("notes.txt")
-
-VOICE_MALE = "tr-TR-AhmetNeural"
-VOICE_FEMALE = "tr-TR-EmelNeural"
-
-OLLAMA_URL = "http://127.0.0.1:11434"
-OLLAMA_MODEL = "llama3.1:8b"  # ollama list ile sende ne varsa onu yaz
-
-TURKEY_CITIES = [
-    "Adana","Adıyaman","Afyonkarahisar","Ağrı","Amasya","Ankara","Antalya","Artvin","Aydın",
-    "Balıkesir","Bilecik","Bingöl","Bitlis","Bolu","Burdur","Bursa","Çanakkale","Çankırı",
-    "Çorum","Denizli","Diyarbakır","Edirne","Elazığ","Erzincan","Erzurum","Eskişehir","Gaziantep",
-    "Giresun","Gümüşhane","Hakkari","Hatay","Isparta","Mersin","İstanbul","İzmir","Kars","Kastamonu",
-    "Kayseri","Kırklareli","Kırşehir","Kocaeli","Konya","Kütahya","Malatya","Manisa","Kahramanmaraş",
-    "Mardin","Muğla","Muş","Nevşehir","Niğde","Ordu","Rize","Sakarya","Samsun","Siirt","Sinop",
-    "Sivas","Tekirdağ","Tokat","Trabzon","Tunceli","Şanlıurfa","Uşak","Van","Yozgat","Zonguldak",
-    "Aksaray","Bayburt","Karaman","Kırıkkale","Batman","Şırnak","Bartın","Ardahan","Iğdır","Yalova",
-    "Karabük","Kilis","Osmaniye","Düzce"
-]
-
-# =========================
-# Helpers
+# Robot Avatar
 # =========================
-def normalize(text: str) -> str:
-    return (text or "").lower().strip()
-
-def tr_day_name(dt: datetime.datetime) -> str:
-    gunler = ["Pazartesi", "Salı", "Çarşamba", "Perşembe", "Cuma", "Cumartesi", "Pazar"]
-    return gunler[dt.weekday()]
-
-def save_note(note: str):
-    ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
-    old = NOTES_FILE.read_text(encoding="utf-8") if NOTES_FILE.exists() else ""
-    NOTES_FILE.write_text(old + f"[{ts}] {note}\n", encoding="utf-8")
-
-def read_notes_last(n=12):
-    if not NOTES_FILE.exists():
-        return []
-    content = NOTES_FILE.read_text(encoding="utf-8").strip()
-    if not content:
-        return []
-    return content.splitlines()[-n:]
-
-def clear_notes():
-    NOTES_FILE.write_text("", encoding="utf-8")
-
-def turkish_fold(s: str) -> str:
-    s = normalize(s)
-    return (
-        s.replace("ı", "i")
-         .replace("ğ", "g")
-         .replace("ş", "s")
-         .replace("ö", "o")
-         .replace("ü", "u")
-         .replace("ç", "c")
-    )
-
-def find_city_in_text(text: str) -> str | None:
-    t = turkish_fold(text)
-    cities_sorted = sorted(TURKEY_CITIES, key=len, reverse=True)
-    for city in cities_sorted:
-        if turkish_fold(city) in t:
-            return city
-    return None
-
-def fetch_weather(city: str) -> str:
-    city = (city or "").strip()
-    if not city:
-        return "Şehir bulamadım. 'İstanbul hava durumu' gibi söyleyebilirsin."
-
-    try:
-        geo = requests.get(
-            "https://geocoding-api.open-meteo.com/v1/search",
-            params={"name": city, "count": 1, "language": "tr", "format": "json"},
-            timeout=10
-        ).json()
-
-        results = geo.get("results") or []
-        if not results:
-            return f"'{city}' için konum bulamadım. Başka bir şehir dener misin?"
-
-        lat = results[0]["latitude"]
-        lon = results[0]["longitude"]
-        resolved = results[0].get("name", city)
-
-        fc = requests.get(
-            "https://api.open-meteo.com/v1/forecast",
-            params={
-                "latitude": lat,
-                "longitude": lon,
-                "daily": "temperature_2m_max,temperature_2m_min,precipitation_probability_max",
-                "timezone": "auto"
-            },
-            timeout=10
-        ).json()
-
-        daily = fc.get("daily") or {}
-        tmax = daily.get("temperature_2m_max") or []
-        tmin = daily.get("temperature_2m_min") or []
-        pop = daily.get("precipitation_probability_max") or []
-
-        if not tmax or not tmin:
-            return "Hava tahminini şu an alamadım."
-
-        p = f"%{int(pop[0])}" if pop and pop[0] is not None else "%?"
-        p_say = p.replace("%", "yüzde ")
-        return (
-            f"{resolved} için bugün: en düşük {tmin[0]} derece, en yüksek {tmax[0]} derece. "
-            f"Yağış olasılığı {p_say}."
-        )
-    except Exception:
-        return "Hava tahminini alamadım. İnternet bağlantın açık mı?"
-
-def stt_listen(recognizer: sr.Recognizer, mic: sr.Microphone, phrase_time_limit=6) -> str | None:
-    with mic as source:
-        recognizer.adjust_for_ambient_noise(source, duration=0.25)
-        audio = recognizer.listen(source, phrase_time_limit=phrase_time_limit)
-    try:
-        return recognizer.recognize_google(audio, language="tr-TR")
-    except Exception:
-        return None
+ANIM_FRAME_MS = 33   # tek frame saati (~30 fps)
+BLINK_MS = 300       # bir göz kırpmanın toplam süresi
 
-# =========================
-# TTS Clean (emoji okumasın)
-# =========================
-def tts_clean(text: str) -> str:
-    if not text:
-        return ""
-    emoji_re = re.compile(
-        "["
-        "\U0001F300-\U0001F5FF"
-        "\U0001F600-\U0001F64F"
-        "\U0001F680-\U0001F6FF"
-        "\U0001F700-\U0001F77F"
-        "\U0001F780-\U0001F7FF"
-        "\U0001F800-\U0001F8FF"
-        "\U0001F900-\U0001F9FF"
-        "\U0001FA00-\U0001FA6F"
-        "\U0001FA70-\U0001FAFF"
-        "\U00002700-\U000027BF"
-        "\U00002600-\U000026FF"
-        "]+",
-        flags=re.UNICODE
-    )
-    text = emoji_re.sub("", text)
-    for ch in ["•", "✅", "✨", "🤖", "☕", "💜", "😄", "😊", "😅"]:
-        text = text.replace(ch, "")
-    text = re.sub(r"\s+", " ", text).strip()
-    return text
+class RobotAvatar(tk.Canvas):
+    """Robot yüzü.
 
-# =========================
-# Ollama Chat (stabil ayarlar)
-# =========================
-def ollama_chat(user_text: str, history: list[dict]) -> str:
-    payload = {
-        "model": OLLAMA_MODEL,
-        "messages": history + [{"role": "user", "content": user_text}],
-        "stream": False,
-        "options": {
-            "temperature": 0.2,
-            "top_p": 0.9,
-            "num_ctx": 4096
-        }
-    }
-    r = requests.post(f"{OLLAMA_URL}/api/chat", json=payload, timeout=120)
-    r.raise_for_status()
-    data = r.json()
-    return data["message"]["content"]
-
-def is_bad_reply(reply: str) -> bool:
-    r = (reply or "").strip().lower()
-    if len(r) < 2:
-        return True
-    if len(r) > 1400:
-        return True
-    bad_signals = [
-        "as an ai", "i'm just", "i cannot", "lorem ipsum",
-        "bunu bilemem ama", "emin değilim ama"
-    ]
-    if any(x in r for x in bad_signals):
-        return True
-    # aşırı alakasız tek kelime/saçma
-    if r in ["tamam", "evet", "hayır", "bilmiyorum"]:
-        return True
-    return False
+    Halo, ağız, göz kırpma ve göz takibi tek bir frame saatinden beslenir. Her frame'de
+    istenen durum hesaplanır, canvas'a yalnızca değişen öğeler yazılır. Konuşma
+    ya da göz kırpma yoksa saat tamamen durur; sadece bir sonraki kırpma için
+    tek bir uyandırma zamanlanır.
+    """
 
-# =========================
-# Robot Avatar
-# =========================
-class RobotAvatar(tk.Canvas):
     def __init__(self, parent, size=300,
                  bg="#070B14",
                  head="#0B1224",
@@ -236,11 +60,24 @@ class RobotAvatar(tk.Canvas):
         self._mouth_phase = 0.0
         self._halo_phase = 0.0
         self._anim_job = None
+        self._anim_idle = False      # _anim_job sadece kırpma uyandırması mı?
+        self._applied = {}           # öğe -> canvas'a en son yazılan değer
+        self._blink_start = None
+        self._next_blink_at = 0.0
+        self._gaze = None            # bekleyen göz takibi hedefi (canvas koordinatı)
+
+        # performans sayaçları (anim_stats ile okunur)
+        self._frames = 0
+        self._canvas_ops = 0
+        self._frame_ms = 0.0
+        self._frame_ms_max = 0.0
+        self._cpu_ms = 0.0
+        self._created = time.monotonic()
 
         self._draw()
         self._center_pupils()
         self._schedule_blink()
-        self._start_anim_loop()
+        self._request_frame()
 
     def _bbox(self, center, r):
         x, y = center
@@ -279,6 +116,12 @@ class RobotAvatar(tk.Canvas):
         self.left_pupil = self.create_oval(*self._bbox(self.left_eye_center, self.pupil_r), fill=self.pupil, outline="")
         self.right_pupil = self.create_oval(*self._bbox(self.right_eye_center, self.pupil_r), fill=self.pupil, outline="")
 
+        # göz bebeklerinin göz içindeki merkezi (kırpma bunları baz alır)
+        self._pupil_pos = {
+            self.left_pupil: self.left_eye_center,
+            self.right_pupil: self.right_eye_center,
+        }
+
         self.mouth_y = cy + 70
         self.mouth = self.create_line(cx-46, self.mouth_y, cx+46, self.mouth_y,
                                       fill="#E2E8F0", width=8, capstyle="round")
@@ -287,17 +130,24 @@ class RobotAvatar(tk.Canvas):
         self.create_oval(cx+84, cy+40, cx+106, cy+62, fill="#60A5FA", outline="")
 
     def set_listening(self, v: bool):
-        self.is_listening = v
+        if self.is_listening != v:
+            self.is_listening = v
+            self._request_frame()
 
     def set_speaking(self, v: bool):
-        self.is_speaking = v
+        if self.is_speaking != v:
+            self.is_speaking = v
+            self._request_frame()
 
     def follow_target(self, tx: float, ty: float):
-        self._move_pupil(self.left_pupil, self.left_eye_center, (tx, ty))
-        self._move_pupil(self.right_pupil, self.right_eye_center, (tx, ty))
+        # sadece hedefi kaydet; frame başına en fazla bir kez uygulanır
+        self._gaze = (tx, ty)
+        self._request_frame()
 
     def _center_pupils(self):
-        self.follow_target(*self.left_eye_center)
+        self._gaze = None
+        self._pupil_pos[self.left_pupil] = self.left_eye_center
+        self._pupil_pos[self.right_pupil] = self.right_eye_center
 
     def _move_pupil(self, pupil_id, eye_center, target):
         ex, ey = eye_center
@@ -311,78 +161,331 @@ class RobotAvatar(tk.Canvas):
 
         px = ex + dx * scale
         py = ey + dy * scale
-        self.coords(pupil_id, *self._bbox((px, py), self.pupil_r))
-
-    def _schedule_blink(self):
-        delay = random.randint(2400, 6200)
-        self.after(delay, self._blink)
-
-    def _blink(self):
-        def squish(step):
-            k = 1 - (step/6)
-            if step <= 6:
-                self._set_eye_squish(max(0.15, k))
-                self.after(22, lambda: squish(step+1))
-            else:
-                def back(step2):
-                    k2 = (step2/6)
-                    self._set_eye_squish(max(0.15, k2))
-                    if step2 < 6:
-                        self.after(22, lambda: back(step2+1))
-                    else:
-                        self._set_eye_squish(1.0)
-                        self._schedule_blink()
-                back(0)
-        squish(0)
-
-    def _set_eye_squish(self, k):
-        def squish_one(eye_id, pupil_id, center):
+        ox, oy = self._pupil_pos[pupil_id]
+        # bir pikselden az kıpırdama -> canvas'a dokunma
+        if abs(px - ox) < 1 and abs(py - oy) < 1:
+            return
+        self._pupil_pos[pupil_id] = (px, py)
+
+    # ---------- dirty-tracked canvas yazımı ----------
+    def _set_coords(self, item, *coords):
+        coords = tuple(round(c, 1) for c in coords)
+        if self._applied.get((item, "coords")) != coords:
+            self._applied[(item, "coords")] = coords
+            self.coords(item, *coords)
+            self._canvas_ops += 1
+
+    def _set_config(self, item, **kw):
+        for key, val in kw.items():
+            if self._applied.get((item, key)) != val:
+                self._applied[(item, key)] = val
+                self.itemconfig(item, **{key: val})
+                self._canvas_ops += 1
+
+    def _render_eyes(self, k):
+        for eye_id, pupil_id, center in (
+            (self.left_eye, self.left_pupil, self.left_eye_center),
+            (self.right_eye, self.right_pupil, self.right_eye_center),
+        ):
             x, y = center
             r = self.eye_r
             h = max(6, int(2*r*k))
-            self.coords(eye_id, x-r, y-h/2, x+r, y+h/2)
+            self._set_coords(eye_id, x-r, y-h/2, x+r, y+h/2)
 
+            px, py = self._pupil_pos[pupil_id]
             pr = self.pupil_r
             ph = max(4, int(2*pr*k))
-            self.coords(pupil_id, x-pr, y-ph/2, x+pr, y+ph/2)
+            self._set_coords(pupil_id, px-pr, py-ph/2, px+pr, py+ph/2)
 
-        squish_one(self.left_eye, self.left_pupil, self.left_eye_center)
-        squish_one(self.right_eye, self.right_pupil, self.right_eye_center)
+    # ---------- frame saati ----------
+    def _schedule_blink(self):
+        self._next_blink_at = time.monotonic() + random.randint(2400, 6200) / 1000
 
-    def _start_anim_loop(self):
+    def _request_frame(self):
         if self._anim_job is not None:
-            return
-        self._anim_job = self.after(33, self._anim_tick)
+            if not self._anim_idle:
+                return
+            self.after_cancel(self._anim_job)
+        self._anim_idle = False
+        self._anim_job = self.after(ANIM_FRAME_MS, self._anim_tick)
 
     def _anim_tick(self):
         self._anim_job = None
+        t0 = time.perf_counter()
+        c0 = time.thread_time()
+        now = time.monotonic()
+
+        # göz kırpma
+        if self._blink_start is None and now >= self._next_blink_at:
+            self._blink_start = now
+        # göz takibi: frame boyunca gelen hareketlerden sadece sonuncusu
+        if self._gaze is not None:
+            target, self._gaze = self._gaze, None
+            self._move_pupil(self.left_pupil, self.left_eye_center, target)
+            self._move_pupil(self.right_pupil, self.right_eye_center, target)
+
+        k = 1.0
+        if self._blink_start is not None:
+            half = BLINK_MS / 2000
+            e = now - self._blink_start
+            if e >= 2 * half:
+                self._blink_start = None
+                self._schedule_blink()
+            else:
+                k = max(0.15, abs(e - half) / half)
+        self._render_eyes(k)
 
-        self._halo_phase += 0.12
-        pulse = (math.sin(self._halo_phase) + 1) / 2
-
+        # halo
         if self.is_speaking:
-            self.itemconfig(self.halo, outline=self.glow_speak)
-            self.itemconfig(self.halo, width=int(7 + 3*pulse))
+            self._halo_phase += 0.12
+            pulse = (math.sin(self._halo_phase) + 1) / 2
+            self._set_config(self.halo, outline=self.glow_speak, width=int(7 + 3*pulse))
         elif self.is_listening:
-            self.itemconfig(self.halo, outline=self.glow_listen)
-            self.itemconfig(self.halo, width=8)
+            self._set_config(self.halo, outline=self.glow_listen, width=8)
         else:
-            self.itemconfig(self.halo, outline="")
-            self.itemconfig(self.halo, width=8)
+            self._set_config(self.halo, outline="", width=8)
 
+        # ağız
+        cx = self.size/2
+        y = self.mouth_y
         if self.is_speaking:
             self._mouth_phase += 0.35
             m = (math.sin(self._mouth_phase) + 1) / 2
-            cx = self.size/2
-            y = self.mouth_y
             amp = 10 + 12*m
-            self.coords(self.mouth, cx-46, y-amp/2, cx+46, y+amp/2)
+            self._set_coords(self.mouth, cx-46, y-amp/2, cx+46, y+amp/2)
         else:
-            cx = self.size/2
-            y = self.mouth_y
-            self.coords(self.mouth, cx-46, y, cx+46, y)
+            self._set_coords(self.mouth, cx-46, y, cx+46, y)
 
-        self._start_anim_loop()
+        if self.is_speaking or self._blink_start is not None:
+            self._request_frame()
+        else:
+            # boşta: saati durdur, sadece sıradaki kırpmada uyan
+            delay = max(ANIM_FRAME_MS, int((self._next_blink_at - time.monotonic()) * 1000))
+            self._anim_idle = True
+            self._anim_job = self.after(delay, self._anim_tick)
+
+        dt = (time.perf_counter() - t0) * 1000
+        self._frames += 1
+        self._frame_ms += dt
+        self._frame_ms_max = max(self._frame_ms_max, dt)
+        self._cpu_ms += (time.thread_time() - c0) * 1000
+
+    def anim_stats(self) -> dict:
+        """Animasyon sayaçları: frame sayısı, canvas çağrıları, frame/CPU süreleri (ms)
+        ve avatar oluşturulduğundan beri saniye başına ortalamaları."""
+        wall_s = max(time.monotonic() - self._created, 1e-9)
+        return {
+            "wall_s": round(wall_s, 1),
+            "frames": self._frames,
+            "canvas_ops": self._canvas_ops,
+            "frame_ms_total": round(self._frame_ms, 3),
+            "frame_ms_max": round(self._frame_ms_max, 3),
+            "cpu_ms_total": round(self._cpu_ms, 3),
+            "frames_per_s": round(self._frames / wall_s, 2),
+            "cpu_ms_per_s": round(self._cpu_ms / wall_s, 3),
+            "idle": self._anim_idle,
+        }
+
+def emit_anim_report(stats: dict):
+    """--anim-stats: kapanışta sayaçları basar (windowed build için dosyaya da)."""
+    text = "Avatar animasyonu\n" + "\n".join(f"  {k:<15} {v}" for k, v in stats.items())
+    Path("anim_stats.txt").write_text(text + "\n", encoding="utf-8")
+    if sys.stderr:
+        print(text, file=sys.stderr)
+
+# =========================
+# Chat Transcript (sanal liste)
+# =========================
+TRANSCRIPT_WINDOW = 120      # ekranda aynı anda tutulan en fazla balon
+TRANSCRIPT_PAGE = 40         # yukarı/aşağı kaydırınca bir kerede yüklenen mesaj
+TRANSCRIPT_STORE_LIMIT = 5000  # bellekte tutulan en fazla mesaj
+
+class MessageStore:
+    """Widget dışı mesaj deposu. Her mesajın mutlak bir sırası var; eskiler toplu atılır."""
+
+    def __init__(self, limit=TRANSCRIPT_STORE_LIMIT):
+        self.limit = limit
+        self._items: list[tuple[str, str]] = []
+        self._base = 0  # _items[0]'ın mutlak sırası
+
+    @property
+    def first(self) -> int:
+        return self._base
+
+    @property
+    def end(self) -> int:
+        return self._base + len(self._items)
+
+    def append(self, who: str, msg: str) -> int:
+        self._items.append((who, msg))
+        # her mesajda değil, TRANSCRIPT_PAGE kadar birikince kırp (amortize O(1))
+        if len(self._items) > self.limit + TRANSCRIPT_PAGE:
+            drop = len(self._items) - self.limit
+            del self._items[:drop]
+            self._base += drop
+        return self.end - 1
+
+    def page(self, start: int, stop: int) -> list[tuple[int, str, str]]:
+        start = max(start, self._base)
+        stop = min(stop, self.end)
+        return [(i, *self._items[i - self._base]) for i in range(start, stop)]
+
+
+class ChatTranscript(tk.Frame):
+    """Tek bir Text widget'ı üzerinde sanal sohbet geçmişi.
+
+    Mesajlar MessageStore'da durur; widget'ta en fazla TRANSCRIPT_WINDOW balon
+    çizilir. Kullanıcı en üste/alta kaydırdıkça sayfa sayfa eski/yeni mesajlar
+    yüklenir, pencerenin öbür ucu kırpılır.
+    """
+
+    def __init__(self, parent, bg, fg, muted, bubble_lee, bubble_user, bubble_user_text, wrap=640):
+        super().__init__(parent, bg=bg)
+        self.bg = bg
+        self.wrap = wrap
+        self.store = MessageStore()
+
+        # çizili pencere: [_lo, _hi) mutlak mesaj sırası
+        self._lo = 0
+        self._hi = 0
+        self._paging = False
+
+        self.text = tk.Text(
+            self, bg=bg, fg=fg, relief="flat", highlightthickness=0, bd=0,
+            wrap="word", font=("Segoe UI", 11), cursor="arrow",
+            padx=12, pady=6, state="disabled"
+        )
+        self.scroll = ttk.Scrollbar(self, orient="vertical", command=self.text.yview)
+        self.text.configure(yscrollcommand=self._on_yscroll)
+
+        self.typing_lbl = tk.Label(self, text="Lee düşünüyor...", bg=bg, fg=muted,
+                                   font=("Segoe UI", 10, "italic"))
+
+        self.scroll.pack(side="right", fill="y")
+        self.text.pack(side="top", fill="both", expand=True)
+
+        self.text.tag_configure("lee", background=bubble_lee, foreground=fg,
+                                lmargin1=12, lmargin2=12, rmargincolor=bg,
+                                spacing1=12, spacing3=12, justify="left")
+        self.text.tag_configure("user", background=bubble_user, foreground=bubble_user_text,
+                                rmargin=12, lmargincolor=bg,
+                                spacing1=12, spacing3=12, justify="right")
+        self.text.tag_configure("gap", font=("Segoe UI", 4))
+        self.text.bind("<Configure>", self._on_configure)
+
+    # ---------- public ----------
+    def append(self, who: str, msg: str):
+        idx = self.store.append(who, msg)
+        if self._hi != idx:
+            # kullanıcı geçmişte geziniyordu -> en sona dön
+            self._render_tail()
+            return
+
+        self._edit(lambda: self._insert(idx, who, msg, "end"))
+        self._hi = idx + 1
+        self._trim_top()
+        self.text.see("end")
+
+    def set_typing(self, on: bool):
+        if on:
+            self.typing_lbl.pack(side="bottom", anchor="w", padx=16, pady=(0, 8), before=self.text)
+        else:
+            self.typing_lbl.pack_forget()
+
+    # ---------- render ----------
+    def _edit(self, fn):
+        self.text.configure(state="normal")
+        try:
+            fn()
+        finally:
+            self.text.configure(state="disabled")
+
+    def _insert(self, idx: int, who: str, msg: str, index: str):
+        kind = "user" if who.lower() == "sen" else "lee"
+        tag = f"m{idx}"
+        self.text.insert(index, msg + "\n", (kind, tag), "\n", ("gap", tag))
+
+    def _remove(self, idx: int):
+        tag = f"m{idx}"
+        rng = self.text.tag_ranges(tag)
+        if rng:
+            self.text.delete(rng[0], rng[-1])
+        self.text.tag_delete(tag)
+
+    def _render_tail(self):
+        def run():
+            for i in range(self._lo, self._hi):
+                self.text.tag_delete(f"m{i}")
+            self.text.delete("1.0", "end")
+            self._hi = self.store.end
+            self._lo = max(self.store.first, self._hi - TRANSCRIPT_WINDOW)
+            for i, who, msg in self.store.page(self._lo, self._hi):
+                self._insert(i, who, msg, "end")
+        self._edit(run)
+        self.text.see("end")
+
+    def _trim_top(self):
+        if self._hi - self._lo <= TRANSCRIPT_WINDOW:
+            return
+        def run():
+            while self._hi - self._lo > TRANSCRIPT_WINDOW:
+                self._remove(self._lo)
+                self._lo += 1
+        self._edit(run)
+
+    def _load_older(self):
+        self._paging = False
+        older = self.store.page(self._lo - TRANSCRIPT_PAGE, self._lo)
+        if not older:
+            return
+
+        def run():
+            self.text.mark_set("view_anchor", "@0,0")
+            self.text.mark_gravity("view_anchor", "right")
+            for i, who, msg in reversed(older):
+                self._insert(i, who, msg, "1.0")
+            self._lo = older[0][0]
+            while self._hi - self._lo > TRANSCRIPT_WINDOW:
+                self._hi -= 1
+                self._remove(self._hi)
+        self._edit(run)
+        self.text.yview("view_anchor")
+
+    def _load_newer(self):
+        self._paging = False
+        newer = self.store.page(self._hi, self._hi + TRANSCRIPT_PAGE)
+        if not newer:
+            return
+
+        def run():
+            self.text.mark_set("view_anchor", "@0,0")
+            self.text.mark_gravity("view_anchor", "left")
+            for i, who, msg in newer:
+                self._insert(i, who, msg, "end")
+            self._hi = newer[-1][0] + 1
+            while self._hi - self._lo > TRANSCRIPT_WINDOW:
+                self._remove(self._lo)
+                self._lo += 1
+        self._edit(run)
+        self.text.yview("view_anchor")
+
+    # ---------- events ----------
+    def _on_yscroll(self, first, last):
+        self.scroll.set(first, last)
+        if self._paging:
+            return
+        if float(first) <= 0.0 and self._lo > self.store.first:
+            self._paging = True
+            self.after_idle(self._load_older)
+        elif float(last) >= 1.0 and self._hi < self.store.end:
+            self._paging = True
+            self.after_idle(self._load_newer)
+
+    def _on_configure(self, event):
+        # balon genişliği ~wrap: karşı taraftaki boşluğu margin olarak ver
+        side = max(24, event.width - self.wrap)
+        self.text.tag_configure("lee", rmargin=side)
+        self.text.tag_configure("user", lmargin1=side, lmargin2=side)
 
 # =========================
 # Main App
@@ -409,31 +512,19 @@ class LeeApp:
         self.root.configure(bg=self.bg)
         self._setup_ttk()
 
-        # STT
-        self.recognizer = sr.Recognizer()
-        self.mic = sr.Microphone()
+        # STT / TTS / HTTP arka planda hazırlanır; pencere beklemez
+        start_subsystems()
+        MONITOR.start()
 
         # TTS
-        self.voice = VOICE_MALE
         self._tts_lock = threading.Lock()
-        self._init_player()
 
         # state
-        self.typing_widget = None
         self._stop_listen_event = threading.Event()
         self._always_thread = None
 
-        # LLM memory (oturum içi)
-        self.llm_history = [
-            {"role": "system", "content": (
-                "Sen Lee adında robotik bir dijital asistansın. Kullanıcı Beyza. Türkçe konuş.\n"
-                "Kurallar:\n"
-                "- Kısa, net cevap ver (maks 6-8 cümle).\n"
-                "- Bilmediğin şeyi UYDURMA. Emin değilsen: 'Emin değilim' de ve 1 kısa soru sor.\n"
-                "- Gereksiz emoji kullanma.\n"
-                "- Kullanıcının istediğini netleştirmeden uzun anlatma.\n"
-            )}
-        ]
+        # niyet mantığı + LLM hafızası (oturum içi); bu pencere onun bir sink'i
+        self.engine = AssistantEngine(sinks=[self])
 
         # Top
         top = tk.Frame(root, bg=self.bg)
@@ -455,6 +546,10 @@ class LeeApp:
         self.status_lbl = tk.Label(center, text="Lee aktif • Hazırım", fg=self.muted, bg=self.bg,
                                    font=("Segoe UI", 11))
         self.status_lbl.pack(anchor="center", pady=(0, 8))
+        self._status_text = "Lee aktif • Hazırım"
+        # kesici durumu değişince (herhangi bir thread'den) etiket güncellensin
+        for svc in SERVICES:
+            svc.listeners.append(lambda _svc: self.root.after(0, self._set_status))
 
         self.robot = RobotAvatar(center, size=300, bg=self.bg)
         self.robot.pack(anchor="center")
@@ -470,17 +565,12 @@ class LeeApp:
         self.side_panel.pack(side="right", fill="y", padx=(12, 0))
         self.side_panel.pack_propagate(False)
 
-        self.chat_canvas = tk.Canvas(self.chat_panel, bg=self.panel, highlightthickness=0)
-        self.chat_canvas.pack(side="left", fill="both", expand=True)
-
-        self.scroll = ttk.Scrollbar(self.chat_panel, orient="vertical", command=self.chat_canvas.yview)
-        self.scroll.pack(side="right", fill="y")
-        self.chat_canvas.configure(yscrollcommand=self.scroll.set)
-
-        self.chat_frame = tk.Frame(self.chat_canvas, bg=self.panel)
-        self.chat_window = self.chat_canvas.create_window((0, 0), window=self.chat_frame, anchor="nw")
-        self.chat_frame.bind("<Configure>", self._on_frame_configure)
-        self.chat_canvas.bind("<Configure>", self._on_canvas_configure)
+        self.transcript = ChatTranscript(
+            self.chat_panel, bg=self.panel, fg=self.text, muted=self.muted,
+            bubble_lee=self.bubble_lee, bubble_user=self.bubble_user,
+            bubble_user_text=self.bubble_user_text
+        )
+        self.transcript.pack(fill="both", expand=True)
 
         # Bottom
         bottom = tk.Frame(root, bg=self.bg)
@@ -503,11 +593,14 @@ class LeeApp:
         # Side panel
         self._build_side_panel()
 
-        # Mouse follow
+        # Mouse follow (avatarın ekran konumu cache'lenir, taşınınca/boyutlanınca sıfırlanır)
+        self._robot_origin = None
         self.root.bind("<Motion>", self._global_mouse_follow)
+        self.root.bind("<Configure>", self._invalidate_robot_origin, add="+")
 
         # boot
-        self.city_var.set("Kahramanmaraş")
+        self.city_var.set(DEFAULT_CITY)
+        self.city_var.trace_add("write", lambda *_: setattr(self.engine, "city", self.city_var.get()))
         self.refresh_notes()
         self.tick_clock()
 
@@ -525,6 +618,7 @@ class LeeApp:
     def on_close(self):
         try:
             self.stop_always_listen()
+            MONITOR.stop()
         except Exception:
             pass
         self.root.destroy()
@@ -553,6 +647,12 @@ class LeeApp:
             self.speak("Sürekli dinleme kapatıldı.")
 
     def _always_listen_loop(self):
+        try:
+            recognizer, mic = STT.get()
+        except Exception:
+            self.root.after(0, lambda: self._set_status("Mikrofon bulunamadı • Yazarak devam et"))
+            return
+
         while not self._stop_listen_event.is_set():
             # Lee konuşuyorsa kendi sesini yakalamasın
             if self.robot.is_speaking:
@@ -560,19 +660,28 @@ class LeeApp:
                 continue
 
             self.root.after(0, lambda: (self.robot.set_listening(True),
-                                        self.status_lbl.config(text="Dinliyorum...")))
+                                        self._set_status("Dinliyorum...")))
 
-            heard = stt_listen(self.recognizer, self.mic, phrase_time_limit=6)
+            with TRACER.turn() as trace:
+                heard = stt_listen(recognizer, mic, phrase_time_limit=6)
 
             self.root.after(0, lambda: (self.robot.set_listening(False),
-                                        self.status_lbl.config(text="Lee aktif • Hazırım")))
+                                        self._set_status("Lee aktif • Hazırım")))
 
             if heard:
-                self.root.after(0, lambda h=heard: self.handle_text(h))
+                self.root.after(0, lambda h=heard, tr=trace: self.handle_text(h, tr))
 
             time.sleep(0.15)
 
     # ---------- UI ----------
+    def _set_status(self, text: str | None = None):
+        """Durum etiketini yazar; çevrimdışı servisler varsa sona eklenir."""
+        if text is not None:
+            self._status_text = text
+        down = service_status_text()
+        self.status_lbl.config(text=f"{self._status_text} • {down}" if down else self._status_text,
+                               fg="#FBBF24" if down else self.muted)
+
     def _setup_ttk(self):
         style = ttk.Style()
         try:
@@ -591,7 +700,7 @@ class LeeApp:
                  font=("Segoe UI", 11, "bold")).pack(anchor="w")
 
         tk.Label(box, text="Şehir", bg=self.panel, fg=self.muted, font=("Segoe UI", 9)).pack(anchor="w", pady=(12, 4))
-        self.city_var = tk.StringVar(value="Kahramanmaraş")
+        self.city_var = tk.StringVar(value=DEFAULT_CITY)
         self.city_combo = ttk.Combobox(box, textvariable=self.city_var, values=TURKEY_CITIES, state="readonly")
         self.city_combo.pack(fill="x")
 
@@ -629,67 +738,35 @@ class LeeApp:
             self.add_bubble("Lee", msg)
             self.speak(msg)
 
+    def _invalidate_robot_origin(self, event=None):
+        # root'a bağlı <Configure> her alt widget için de gelir; sadece pencere
+        # (taşıma/boyut) ve avatarın kendisi konumu değiştirir
+        if event is None or event.widget in (self.root, self.robot):
+            self._robot_origin = None
+
     def _global_mouse_follow(self, event):
         try:
-            rx = event.x_root - self.robot.winfo_rootx()
-            ry = event.y_root - self.robot.winfo_rooty()
-            self.robot.follow_target(rx, ry)
+            if self._robot_origin is None:
+                self._robot_origin = (self.robot.winfo_rootx(), self.robot.winfo_rooty())
+            ox, oy = self._robot_origin
+            self.robot.follow_target(event.x_root - ox, event.y_root - oy)
         except Exception:
             pass
 
     # ---------- chat ----------
     def add_bubble(self, who: str, msg: str):
-        outer = tk.Frame(self.chat_frame, bg=self.panel)
-        outer.pack(fill="x", pady=6, padx=12)
-
-        is_user = (who.lower() == "sen")
-        anchor = "e" if is_user else "w"
-
-        bubble_bg = self.bubble_user if is_user else self.bubble_lee
-        bubble_fg = self.bubble_user_text if is_user else self.text
-
-        wrap = 640
-        b = tk.Frame(outer, bg=self.panel)
-        b.pack(anchor=anchor)
-
-        lbl = tk.Label(
-            b, text=msg, bg=bubble_bg, fg=bubble_fg,
-            font=("Segoe UI", 11), justify="left", wraplength=wrap,
-            padx=14, pady=12
-        )
-        lbl.pack(anchor=anchor)
-
-        self.root.after(50, lambda: self.chat_canvas.yview_moveto(1.0))
+        self.transcript.append(who, msg)
 
     def show_typing(self):
-        if self.typing_widget is not None:
-            return
-        self.typing_widget = tk.Label(self.chat_frame, text="Lee düşünüyor...", bg=self.panel, fg=self.muted,
-                                      font=("Segoe UI", 10, "italic"))
-        self.typing_widget.pack(anchor="w", padx=16, pady=(0, 8))
-        self.root.after(50, lambda: self.chat_canvas.yview_moveto(1.0))
+        self.transcript.set_typing(True)
 
     def hide_typing(self):
-        if self.typing_widget is None:
-            return
-        self.typing_widget.destroy()
-        self.typing_widget = None
-
-    def _on_frame_configure(self, _):
-        self.chat_canvas.configure(scrollregion=self.chat_canvas.bbox("all"))
-
-    def _on_canvas_configure(self, event):
-        self.chat_canvas.itemconfig(self.chat_window, width=event.width)
+        self.transcript.set_typing(False)
 
     # ---------- audio ----------
-    def _init_player(self):
-        try:
-            pygame.mixer.init()
-        except Exception:
-            pass
-
-    def speak(self, text: str):
-        clean = tts_clean(text)
+    def speak(self, text: str, trace: str | None = None):
+        with TRACER.turn(trace) as trace, TRACER.span("tts_clean"):
+            clean = tts_clean(text)
         if not clean:
             return
 
@@ -698,36 +775,15 @@ class LeeApp:
         def done_off():
             self.robot.set_speaking(False)
 
-        threading.Thread(target=self._speak_neural_thread, args=(clean, done_off), daemon=True).start()
-
-    def _speak_neural_thread(self, text: str, on_done):
-        with self._tts_lock:
-            async def _run():
-                fd, filename = tempfile.mkstemp(suffix=".mp3")
-                os.close(fd)
-                try:
-                    await edge_tts.Communicate(text, self.voice).save(filename)
-                    pygame.mixer.music.load(filename)
-                    pygame.mixer.music.play()
-                    while pygame.mixer.music.get_busy():
-                        time.sleep(0.05)
-                finally:
-                    try:
-                        pygame.mixer.music.stop()
-                    except Exception:
-                        pass
-                    try:
-                        os.remove(filename)
-                    except Exception:
-                        pass
+        threading.Thread(target=self._speak_neural_thread, args=(clean, done_off, trace), daemon=True).start()
 
+    def _speak_neural_thread(self, text: str, on_done, trace: str | None = None):
+        with TRACER.turn(trace), self._tts_lock:
             try:
-                asyncio.run(_run())
-            except RuntimeError:
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                loop.run_until_complete(_run())
-                loop.close()
+                play_speech(text, self.engine.voice)
+            except Exception:
+                # ses alt sistemi yüklenemedi ya da çalma hatası -> sessiz devam
+                pass
 
         try:
             self.root.after(0, on_done)
@@ -748,34 +804,15 @@ class LeeApp:
 
     # ---------- actions ----------
     def show_help(self):
-        messagebox.showinfo(
-            "Komutlar",
-            "• saat kaç\n"
-            "• tarih ne\n"
-            "• İstanbul hava durumu / Ankara hava tahmini\n"
-            "• not al: ...\n"
-            "• notlar\n"
-            "• notları sil\n"
-            "• güncelle / notları yenile\n"
-            "• kapat\n"
-            "• normal sohbet (Ollama)"
-        )
+        messagebox.showinfo("Komutlar", HELP_TEXT)
 
     def toggle_voice(self):
-        self.voice = VOICE_FEMALE if self.voice == VOICE_MALE else VOICE_MALE
-        self.add_bubble("Lee", f"Ses değişti: {self.voice}")
+        self.engine.voice = VOICE_FEMALE if self.engine.voice == VOICE_MALE else VOICE_MALE
+        self.add_bubble("Lee", f"Ses değişti: {self.engine.voice}")
         self.speak("Ses değiştirildi.")
 
     def say_weather(self):
-        city = self.city_var.get()
-        self.add_bubble("Sen", f"{city} hava durumu")
-        self.show_typing()
-
-        def run():
-            msg = fetch_weather(city)
-            self.root.after(0, lambda: (self.hide_typing(), self.add_bubble("Lee", msg), self.speak(msg)))
-
-        threading.Thread(target=run, daemon=True).start()
+        self.handle_text(f"{self.city_var.get()} hava durumu")
 
     # ---------- input ----------
     def send_text(self):
@@ -786,134 +823,82 @@ class LeeApp:
         self.handle_text(txt)
 
     # ---------- core logic ----------
-    def handle_text(self, text: str):
-        self.add_bubble("Sen", text)
-        t = normalize(text)
-
-        # NOTLARI SİL
-        if ("notları sil" in t) or ("notlari sil" in t) or ("tüm notları sil" in t) or ("tum notlari sil" in t):
-            try:
-                clear_notes()
-            except Exception:
-                pass
-            self.refresh_notes()
-            msg = "Tamam. Tüm notları sildim."
-            self.add_bubble("Lee", msg)
-            self.speak(msg)
-            return
-
-        # GÜNCELLE / YENİLE
-        if (t == "güncelle") or (t == "guncelle") or ("notları güncelle" in t) or ("notlari guncelle" in t) or ("notları yenile" in t) or ("notlari yenile" in t):
-            self.refresh_notes()
-            msg = "Notları güncelledim."
-            self.add_bubble("Lee", msg)
-            self.speak(msg)
-            return
-
-        # weather
-        if "hava" in t or "tahmin" in t:
-            found = find_city_in_text(text)
-            if found:
-                self.city_var.set(found)
-
-            self.show_typing()
-
-            def run():
-                msg = fetch_weather(self.city_var.get())
-                self.root.after(0, lambda: (self.hide_typing(), self.add_bubble("Lee", msg), self.speak(msg)))
-
-            threading.Thread(target=run, daemon=True).start()
-            return
-
-        # time
-        if "saat" in t:
-            now = datetime.datetime.now()
-            msg = f"Şu an saat {now.strftime('%H:%M:%S')}."
-            self.add_bubble("Lee", msg)
-            self.speak(msg)
-            return
-
-        # date
-        if "tarih" in t or t == "bugün" or "bugün günlerden" in t:
-            now = datetime.datetime.now()
-            msg = f"Bugün {tr_day_name(now)}, {now.strftime('%d.%m.%Y')}."
-            self.add_bubble("Lee", msg)
-            self.speak(msg)
-            return
-
-        # notes add
-        if "not al" in t:
-            note = text
-            if ":" in text:
-                note = text.split(":", 1)[1].strip()
-            else:
-                note = text.lower().split("not al", 1)[-1].strip(" :")
-
-            if not note:
-                msg = "Not için 'Not al: ...' şeklinde yazabilirsin."
+    def handle_text(self, text: str, trace: str | None = None):
+        # motor bloklayabilir (hava/LLM); olaylar emit() ile Tk thread'ine döner
+        threading.Thread(target=self._run_turn, args=(text, trace), daemon=True).start()
+
+    def _run_turn(self, text: str, trace: str | None):
+        with TRACER.turn(trace):
+            self.engine.handle(text)
+
+    def emit(self, event: Event):
+        # trace id Tk thread'ine taşınsın ki TTS aynı tura yazılsın
+        self.root.after(0, self._apply_event, event, TRACER.current())
+
+    def _apply_event(self, event: Event, trace: str | None = None):
+        kind, data = event.kind, event.data
+        if kind == "user":
+            self.add_bubble("Sen", data["text"])
+        elif kind == "reply":
+            if data["text"]:
+                self.add_bubble("Lee", data["text"])
+            self.speak(data["speech"], trace)
+        elif kind == "typing":
+            if data["on"]:
+                self.show_typing()
             else:
-                save_note(note)
-                self.refresh_notes()
-                msg = f"Not aldım: {note}"
-
-            self.add_bubble("Lee", msg)
-            self.speak(msg)
-            return
-
-        # notes list
-        if "notlar" in t:
-            lines = read_notes_last(8)
-            msg = "Son notların:\n" + ("\n".join(lines) if lines else "Henüz not yok.")
-            self.add_bubble("Lee", msg)
-            self.speak("Notlarını okudum.")
-            return
-
-        # exit
-        if t in ["kapat", "çık", "bitir", "exit", "quit"]:
-            msg = "Tamam, görüşürüz."
-            self.add_bubble("Lee", msg)
-            self.speak(msg)
+                self.hide_typing()
+        elif kind == "notes_changed":
+            self.refresh_notes()
+        elif kind == "city":
+            self.city_var.set(data["city"])
+        elif kind == "help":
+            self.show_help()
+        elif kind == "exit":
             self.stop_always_listen()
             self.root.after(450, self.root.destroy)
-            return
-
-        # help
-        if "yardım" in t or "komut" in t:
-            self.show_help()
-            self.speak("Komutları ekrana getirdim.")
-            return
-
-        # ---------- LLM fallback (Ollama) ----------
-        self.show_typing()
-
-        def run_llm():
-            try:
-                reply = ollama_chat(text, self.llm_history)
-
-                # kötü cevap yakala -> 1 kez düzeltme dene
-                if is_bad_reply(reply):
-                    fix = ("Cevabın alakasız/uydurma oldu. Uydurma yapma. "
-                           "Emin değilsen 'Emin değilim' de ve 1 kısa soru sor. "
-                           "Kısa net cevap ver.")
-                    reply = ollama_chat(f"{fix}\nKullanıcı: {text}", self.llm_history)
-
-                # history güncelle (system + son 10 mesaj)
-                self.llm_history.append({"role": "user", "content": text})
-                self.llm_history.append({"role": "assistant", "content": reply})
-                self.llm_history = [self.llm_history[0]] + self.llm_history[-10:]
-
-            except Exception:
-                reply = "Beyin modülüne bağlanamadım. Ollama açık mı? (ollama serve)"
-
-            self.root.after(0, lambda: (self.hide_typing(), self.add_bubble("Lee", reply), self.speak(reply)))
-
-        threading.Thread(target=run_llm, daemon=True).start()
 
 
 # =========================
 # Run
 # =========================
 if __name__ == "__main__":
-    root = tk.Tk()
-    app = LeeApp(root)
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Lee dijital asistan")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="import ve init aşamalarının süresini raporla")
+    parser.add_argument("--anim-stats", action="store_true",
+                        help="kapanışta avatar frame/CPU sayaçlarını raporla (boşta maliyet)")
+    parser.add_argument("--trace", action="store_true",
+                        help=f"tur aşamalarını {TRACE_FILE} dosyasına yaz (ya da LEE_TRACE=1)")
+    parser.add_argument("--trace-report", nargs="?", const=str(TRACE_FILE), metavar="DOSYA",
+                        help="trace dosyasından aşama başına yüzdelik raporu bas ve çık")
+    args = parser.parse_args()
+
+    if args.trace_report:
+        print(trace_report(Path(args.trace_report)))
+        sys.exit(0)
+    if args.trace or os.environ.get("LEE_TRACE") == "1":
+        TRACER.enable()
+
+    PROFILER.enabled = args.profile_startup
+    # ağır modüller, Tk penceresi kurulurken arka planda yüklensin
+    start_subsystems()
+
+    with PROFILER.stage("tk root"):
+        root = tk.Tk()
+    with PROFILER.stage("LeeApp init"):
+        app = LeeApp(root)
+
+    if PROFILER.enabled:
+        def _report():
+            wait([sub.start() for sub in (HTTP, TTS, STT)])
+            PROFILER.emit_report()
+
+        # ilk boşta kalış = pencere ekranda ve tepki veriyor
+        root.after_idle(lambda: (PROFILER.mark("window ready"),
+                                 threading.Thread(target=_report, daemon=True).start()))
     root.mainloop()
+    if args.anim_stats:
+        emit_anim_report(app.robot.anim_stats())
@@ -0,0 +1,1192 @@
+# lee_core.py
+# Lee'nin Tk'siz çekirdeği: ayarlar, tembel init, izleme, dayanıklılık,
+# metin normalizasyonu, niyet yönlendirici ve AssistantEngine. Masaüstü
+# arayüzü (chatbot.py), sunucu (lee_server.py) ve bench.py bunu import eder;
+# tkinter yüklemez, ekransız makinede çalışır.
+import threading
+import datetime
+from pathlib import Path
+import time
+import os
+import tempfile
+import asyncio
+import math
+import re
+import json
+import sys
+import atexit
+import bisect
+import functools
+import itertools
+import queue
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable
+
+# Ağır modüller (speech_recognition, edge_tts, pygame, requests) açılışı
+# yavaşlatmasın diye arka planda, ilk ihtiyaçta yüklenir. Bkz. "Lazy Init".
+if TYPE_CHECKING:
+    import speech_recognition as sr
+
+# =========================
+# Config
+# =========================
+NOTES_FILE = Path("notes.txt")
+
+VOICE_MALE = "tr-TR-AhmetNeural"
+VOICE_FEMALE = "tr-TR-EmelNeural"
+
+OLLAMA_URL = "http://127.0.0.1:11434"
+OLLAMA_MODEL = "llama3.1:8b"  # ollama list ile sende ne varsa onu yaz
+
+GEOCODE_URL = "https://geocoding-api.open-meteo.com/v1/search"
+FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
+
+TURKEY_CITIES = [
+    "Adana","Adıyaman","Afyonkarahisar","Ağrı","Amasya","Ankara","Antalya","Artvin","Aydın",
+    "Balıkesir","Bilecik","Bingöl","Bitlis","Bolu","Burdur","Bursa","Çanakkale","Çankırı",
+    "Çorum","Denizli","Diyarbakır","Edirne","Elazığ","Erzincan","Erzurum","Eskişehir","Gaziantep",
+    "Giresun","Gümüşhane","Hakkari","Hatay","Isparta","Mersin","İstanbul","İzmir","Kars","Kastamonu",
+    "Kayseri","Kırklareli","Kırşehir","Kocaeli","Konya","Kütahya","Malatya","Manisa","Kahramanmaraş",
+    "Mardin","Muğla","Muş","Nevşehir","Niğde","Ordu","Rize","Sakarya","Samsun","Siirt","Sinop",
+    "Sivas","Tekirdağ","Tokat","Trabzon","Tunceli","Şanlıurfa","Uşak","Van","Yozgat","Zonguldak",
+    "Aksaray","Bayburt","Karaman","Kırıkkale","Batman","Şırnak","Bartın","Ardahan","Iğdır","Yalova",
+    "Karabük","Kilis","Osmaniye","Düzce"
+]
+
+# =========================
+# Lazy Init (hızlı açılış)
+# =========================
+class StartupProfiler:
+    """--profile-startup: import ve init aşamalarının süresini toplar."""
+
+    def __init__(self):
+        self.enabled = False
+        self.t0 = time.perf_counter()
+        self.stages: list[tuple[str, float, float, str]] = []  # ad, başlangıç ms, süre ms, thread
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                self.stages.append((name, (start - self.t0) * 1000, (end - start) * 1000,
+                                    threading.current_thread().name))
+
+    def mark(self, name: str):
+        with self.stage(name):
+            pass
+
+    def report(self) -> str:
+        lines = ["Lee açılış profili (ms, süreç başından itibaren):"]
+        for name, start, dur, thread in sorted(self.stages, key=lambda x: x[1]):
+            lines.append(f"  +{start:8.1f}  {dur:8.1f}  {name:<28} [{thread}]")
+        return "\n".join(lines)
+
+    def emit_report(self):
+        text = self.report()
+        # --windowed PyInstaller build'inde stderr yok -> dosyaya da yaz
+        Path("startup_profile.txt").write_text(text + "\n", encoding="utf-8")
+        if sys.stderr:
+            print(text, file=sys.stderr)
+
+
+PROFILER = StartupProfiler()
+_INIT_POOL = ThreadPoolExecutor(max_workers=3, thread_name_prefix="lee-init")
+
+class Subsystem:
+    """Arka planda bir kez başlatılan alt sistem. get() hazır olana kadar bekler."""
+
+    def __init__(self, name: str, factory):
+        self.name = name
+        self._factory = factory
+        self._future: Future | None = None
+        self._lock = threading.Lock()
+
+    def start(self) -> Future:
+        with self._lock:
+            if self._future is None:
+                self._future = _INIT_POOL.submit(self._run)
+            return self._future
+
+    def _run(self):
+        with PROFILER.stage(f"init {self.name}"):
+            return self._factory()
+
+    def get(self, timeout=None):
+        return self.start().result(timeout)
+
+    @property
+    def ready(self) -> bool:
+        return self._future is not None and self._future.done()
+
+def _init_http():
+    with PROFILER.stage("import requests"):
+        import requests
+    # tek Session: bağlantılar (keep-alive) istekler arasında tekrar kullanılır.
+    # Sunucu modunda aynı Session'ı birçok thread paylaşır -> havuz geniş.
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=64)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def _init_tts():
+    with PROFILER.stage("import edge_tts"):
+        import edge_tts
+    with PROFILER.stage("import pygame"):
+        import pygame
+    with PROFILER.stage("pygame.mixer.init"):
+        try:
+            pygame.mixer.init()
+        except Exception:
+            pass
+    return edge_tts, pygame
+
+def _init_stt():
+    with PROFILER.stage("import speech_recognition"):
+        import speech_recognition as sr
+    with PROFILER.stage("open microphone"):
+        return sr.Recognizer(), sr.Microphone()
+
+HTTP = Subsystem("http", _init_http)
+TTS = Subsystem("tts", _init_tts)
+STT = Subsystem("stt", _init_stt)
+
+def start_subsystems():
+    for sub in (HTTP, TTS, STT):
+        sub.start()
+
+# =========================
+# Tracing (tur gecikmesi)
+# =========================
+TRACE_FILE = Path("lee_trace.jsonl")
+TRACE_MAX_BYTES = 5 * 1024 * 1024   # bu boyutu geçince dosya döner (.1, .2, ...)
+TRACE_BACKUPS = 3
+
+_trace_id: ContextVar[str | None] = ContextVar("lee_trace_id", default=None)
+_trace_seq = itertools.count(1)
+
+def _new_trace_id() -> str:
+    return f"{os.getpid():x}-{next(_trace_seq):x}"
+
+class Span:
+    """Bir aşamanın süresi. mark() ile span içi ara noktalar (ms) eklenir."""
+
+    __slots__ = ("tracer", "name", "attrs", "marks", "trace", "ts", "t0")
+
+    def __init__(self, tracer: "Tracer", name: str, attrs: dict):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.marks = None
+
+    def __enter__(self):
+        self.trace = _trace_id.get() or _new_trace_id()
+        self.ts = time.time()
+        self.t0 = time.perf_counter()
+        return self
+
+    def mark(self, name: str):
+        if self.marks is None:
+            self.marks = {}
+        self.marks[name] = round((time.perf_counter() - self.t0) * 1000, 3)
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __exit__(self, exc_type, exc, tb):
+        rec = {"trace": self.trace, "span": self.name, "ts": round(self.ts, 3),
+               "ms": round((time.perf_counter() - self.t0) * 1000, 3)}
+        if self.marks:
+            rec["marks"] = self.marks
+        if self.attrs:
+            rec.update(self.attrs)
+        if exc_type is not None:
+            rec["error"] = exc_type.__name__
+        self.tracer._put(rec)
+        return False
+
+class _NullSpan:
+    """Tracing kapalıyken dönen, hiçbir şey yapmayan span."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def mark(self, name: str):
+        pass
+
+    def set(self, **attrs):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+class Tracer:
+    """Span kayıtlarını arka plan thread'inde dönen bir JSONL dosyasına yazar.
+
+    Kapalıyken span() paylaşılan bir _NullSpan döndürür; açıkken bir span'in
+    maliyeti bir dict ve bir kuyruk put'u kadardır, disk I/O'su toplu yapılır.
+    """
+
+    def __init__(self, path: Path = TRACE_FILE, max_bytes=TRACE_MAX_BYTES, backups=TRACE_BACKUPS):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.enabled = False
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = None
+
+    def enable(self, path: Path | None = None):
+        if path is not None:
+            self.path = Path(path)
+        self.enabled = True
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._writer, name="lee-trace", daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def span(self, name: str, **attrs):
+        return Span(self, name, attrs) if self.enabled else _NULL_SPAN
+
+    @contextmanager
+    def turn(self, trace_id: str | None = None):
+        """Bir tur boyunca (thread'ler arası taşınan) trace id'yi etkin kılar."""
+        if not self.enabled:
+            yield None
+            return
+        tid = trace_id or _trace_id.get() or _new_trace_id()
+        token = _trace_id.set(tid)
+        try:
+            yield tid
+        finally:
+            _trace_id.reset(token)
+
+    def current(self) -> str | None:
+        return _trace_id.get()
+
+    def flush(self, timeout: float = 2.0):
+        """Kuyruktakiler yazılana kadar bekler; writer ölmüşse ya da süre
+        dolarsa beklemeden döner (atexit'te süreç asılı kalmasın)."""
+        if self._thread is None:
+            return
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks and self._thread.is_alive():
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                self._queue.all_tasks_done.wait(left)
+
+    def _put(self, rec: dict):
+        # writer yoksa kayıt kuyrukta birikmesin
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(rec)
+
+    def _writer(self):
+        f = None
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < 512:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                if f is None:
+                    f = open(self.path, "a", encoding="utf-8")
+                # serileşmeyen öznitelik kaydı düşürmesin: str'e çevrilir
+                f.write("".join(json.dumps(rec, ensure_ascii=False, default=str) + "\n" for rec in batch))
+                f.flush()
+                if f.tell() >= self.max_bytes:
+                    f.close()
+                    f = None
+                    self._rotate()
+            except OSError:
+                # dosya açılamıyor (ör. salt okunur dizin): tracing kapanır,
+                # kuyruk boşaltılmaya devam eder
+                self.enabled = False
+                f = None
+            except Exception:
+                pass
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            src = self.path.with_name(f"{self.path.name}.{i}")
+            if src.exists():
+                os.replace(src, self.path.with_name(f"{self.path.name}.{i + 1}"))
+        os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+
+
+TRACER = Tracer()
+
+def percentile(sorted_xs: list[float], p: float) -> float:
+    """Sıralı listede en yakın sıra (nearest-rank) yüzdeliği: ceil(p/100*n). eleman."""
+    return sorted_xs[max(0, min(len(sorted_xs) - 1, math.ceil(p / 100 * len(sorted_xs)) - 1))]
+
+_HIST_EDGES_MS = [1, 5, 10, 50, 100, 500, 1000, 5000, 10000]
+
+def trace_report(path: Path = TRACE_FILE) -> str:
+    """Trace dosyalarından aşama başına yüzdelik ve histogram raporu üretir."""
+    path = Path(path)
+    files = [path.with_name(f"{path.name}.{i}") for i in range(TRACE_BACKUPS, 0, -1)] + [path]
+    samples: dict[str, list[float]] = {}
+    for fp in files:
+        if not fp.exists():
+            continue
+        with open(fp, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                samples.setdefault(rec["span"], []).append(rec["ms"])
+                for m, v in (rec.get("marks") or {}).items():
+                    samples.setdefault(f"{rec['span']}.{m}", []).append(v)
+
+    if not samples:
+        return f"{path}: kayıt yok."
+
+    lines = [f"{'aşama':<28}{'n':>7}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}  (ms)"]
+    for name in sorted(samples):
+        xs = sorted(samples[name])
+        lines.append(f"{name:<28}{len(xs):>7}{percentile(xs, 50):>10.1f}{percentile(xs, 90):>10.1f}"
+                     f"{percentile(xs, 99):>10.1f}{xs[-1]:>10.1f}")
+        counts = [0] * (len(_HIST_EDGES_MS) + 1)
+        for x in xs:
+            counts[bisect.bisect_right(_HIST_EDGES_MS, x)] += 1
+        labels = [f"<{e}" for e in _HIST_EDGES_MS] + [f">={_HIST_EDGES_MS[-1]}"]
+        for label, c in zip(labels, counts):
+            if c:
+                lines.append(f"    {label:>7} {'#' * max(1, round(40 * c / len(xs)))} {c}")
+    return "\n".join(lines)
+
+# =========================
+# Resilience (devre kesici + uyarlanır zaman aşımı)
+# =========================
+# Ağ ya da Ollama düştüğünde her çağrı sabit zaman aşımını (10 s / 120 s)
+# beklemesin: art arda hatalar kesiciyi açar, açık kesici ağa çıkmadan
+# ServiceDown fırlatır; arka plandaki yoklama servis dönünce kesiciyi kapatır.
+BREAKER_FAILURES = 3      # art arda bu kadar hata -> kesici açılır
+BREAKER_COOLDOWN_S = 15.0 # açık kesici bu süreden sonra tek bir deneme isteğine izin verir
+PROBE_DOWN_S = 5.0        # açık servisi yoklama aralığı
+PROBE_IDLE_S = 60.0       # kapalı kesicili servisi, son istekten bu kadar sonra yokla...
+PROBE_RECENT_S = 300.0    # ...ama sadece son bu kadar sürede kullanıldıysa
+
+class ServiceDown(Exception):
+    """Kesici açık; istek ağa hiç çıkmadan reddedildi."""
+
+class AdaptiveTimeout:
+    """Gözlenen gecikmeden türeyen okuma zaman aşımı (TCP RTO gibi).
+
+    srtt + k * rttvar, [floor, ceiling] aralığına kırpılır; ölçüm yokken
+    initial kullanılır.
+    """
+
+    def __init__(self, initial: float, floor: float, ceiling: float, k: float = 4.0):
+        self.initial = initial
+        self.floor = floor
+        self.ceiling = ceiling
+        self.k = k
+        self.srtt: float | None = None
+        self.rttvar = 0.0
+
+    def observe(self, seconds: float):
+        if self.srtt is None:
+            self.srtt, self.rttvar = seconds, seconds / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - seconds)
+            self.srtt = 0.875 * self.srtt + 0.125 * seconds
+
+    @property
+    def value(self) -> float:
+        if self.srtt is None:
+            return self.initial
+        return min(self.ceiling, max(self.floor, self.srtt + self.k * self.rttvar))
+
+class Service:
+    """Bir uzak servisin kesicisi, zaman aşımı ve sağlık yoklaması.
+
+    Durumlar: "closed" (normal), "open" (istekler anında reddedilir),
+    "half_open" (bekleme bitti, tek bir deneme isteği yolda). Durum her
+    değiştiğinde listeners'daki fonksiyonlar servisle çağrılır (çağıranın
+    thread'inde).
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, label: str, probe: Callable[[tuple], None],
+                 latency: AdaptiveTimeout, connect_timeout: float):
+        self.name = name
+        self.label = label
+        self.latency = latency
+        self.connect_timeout = connect_timeout
+        self.listeners: list[Callable[["Service"], None]] = []
+        self._probe = probe
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._last_used = float("-inf")   # hiç kullanılmayan servis yoklanmaz
+        self._last_probe = 0.0
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    @property
+    def timeout(self) -> tuple[float, float]:
+        """requests'e verilecek (bağlantı, okuma) zaman aşımı."""
+        return self.connect_timeout, self.latency.value
+
+    @property
+    def rejecting(self) -> bool:
+        """Şu an bir istek gelse anında reddedilir mi? (durumu değiştirmez)"""
+        with self._lock:
+            if self._state == self.OPEN:
+                return time.monotonic() - self._opened_at < BREAKER_COOLDOWN_S
+            return self._state == self.HALF_OPEN
+
+    def allow(self) -> bool:
+        with self._lock:
+            self._last_used = time.monotonic()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN or self._last_used - self._opened_at < BREAKER_COOLDOWN_S:
+                return False
+            self._state = self.HALF_OPEN
+        self._notify()
+        return True
+
+    def record_success(self, seconds: float | None = None):
+        with self._lock:
+            if seconds is not None:
+                self.latency.observe(seconds)
+            self._failures = 0
+            changed = self._state != self.CLOSED
+            self._state = self.CLOSED
+        if changed:
+            self._notify()
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.CLOSED and self._failures < BREAKER_FAILURES:
+                return
+            changed = self._state != self.OPEN
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+        if changed:
+            self._notify()
+
+    @contextmanager
+    def call(self, observe: bool = True):
+        """Servise tek bir istek. Kesici açıksa ServiceDown; değilse
+        (bağlantı, okuma) zaman aşımını verir ve sonucu kesiciye işler.
+        observe=False ise gecikmeyi çağıran latency.observe() ile kendisi
+        bildirir (ör. akışta ilk parçanın süresi)."""
+        if not self.allow():
+            raise ServiceDown(self.name)
+        t0 = time.perf_counter()
+        failed = False
+        try:
+            yield self.timeout
+        except Exception:
+            failed = True
+            self.record_failure()
+            raise
+        finally:
+            # GeneratorExit vb. (akış erken bırakıldı) de başarı sayılır
+            if not failed:
+                self.record_success(time.perf_counter() - t0 if observe else None)
+
+    def probe_due(self, now: float) -> bool:
+        if self._state != self.CLOSED:
+            return now - self._last_probe >= PROBE_DOWN_S
+        # kullanıcı hava/sohbet istemiyorsa dış servislere hiç gidilmez
+        if now - self._last_used >= PROBE_RECENT_S:
+            return False
+        return now - max(self._last_used, self._last_probe) >= PROBE_IDLE_S
+
+    def probe(self):
+        self._last_probe = time.monotonic()
+        try:
+            self._probe((self.connect_timeout, 3.0))
+        except Exception:
+            # tek başarısız yoklama, tek başarısız istek kadar sayılır
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def _notify(self):
+        for fn in list(self.listeners):
+            try:
+                fn(self)
+            except Exception:
+                pass
+
+def _probe_ollama(timeout):
+    HTTP.get().get(f"{OLLAMA_URL}/api/tags", timeout=timeout).raise_for_status()
+
+def _probe_meteo(timeout):
+    HTTP.get().get(GEOCODE_URL, params={"name": "Ankara", "count": 1},
+                   timeout=timeout).raise_for_status()
+
+# okuma zaman aşımı: Ollama'da ilk parçaya kadar (soğuk model yüklemesi
+# uzun sürebilir, taban geniş), Open-Meteo'da istek başına
+OLLAMA = Service("ollama", "Ollama", _probe_ollama,
+                 AdaptiveTimeout(initial=120.0, floor=20.0, ceiling=120.0), connect_timeout=1.0)
+METEO = Service("meteo", "Hava servisi", _probe_meteo,
+                AdaptiveTimeout(initial=10.0, floor=1.5, ceiling=10.0), connect_timeout=3.05)
+SERVICES = (OLLAMA, METEO)
+
+def service_states() -> dict[str, str]:
+    return {s.name: s.state for s in SERVICES}
+
+def service_status_text() -> str:
+    """Kapalı kesicisi olmayan servisler için kısa durum metni ("" = hepsi normal)."""
+    parts = []
+    for s in SERVICES:
+        if s.state == Service.OPEN:
+            parts.append(f"{s.label} çevrimdışı")
+        elif s.state == Service.HALF_OPEN:
+            parts.append(f"{s.label} yeniden deneniyor")
+    return " • ".join(parts)
+
+class HealthMonitor:
+    """Servisleri arka planda yoklar: açık kesiciyi kullanıcı beklemeden
+    kapatır, yakın zamanda kullanılan servisin düştüğünü bir sonraki
+    istekten önce fark eder. Hiç kullanılmayan servise gidilmez."""
+
+    def __init__(self, services, tick_s: float = 1.0):
+        self.services = services
+        self.tick_s = tick_s
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="lee-health", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(self.tick_s):
+            now = time.monotonic()
+            for svc in self.services:
+                if svc.probe_due(now):
+                    svc.probe()
+
+MONITOR = HealthMonitor(SERVICES)
+
+# =========================
+# Helpers
+# =========================
+def normalize(text: str) -> str:
+    return (text or "").lower().strip()
+
+def tr_day_name(dt: datetime.datetime) -> str:
+    gunler = ["Pazartesi", "Salı", "Çarşamba", "Perşembe", "Cuma", "Cumartesi", "Pazar"]
+    return gunler[dt.weekday()]
+
+def _note_line(note: str) -> str:
+    ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
+    return f"[{ts}] {note}"
+
+def save_note(note: str):
+    # dosyayı baştan yazmak yerine sona ekle (not sayısıyla büyümesin)
+    with open(NOTES_FILE, "a", encoding="utf-8") as f:
+        f.write(_note_line(note) + "\n")
+
+def read_notes_last(n=12):
+    if not NOTES_FILE.exists():
+        return []
+    content = NOTES_FILE.read_text(encoding="utf-8").strip()
+    if not content:
+        return []
+    return content.splitlines()[-n:]
+
+def clear_notes():
+    NOTES_FILE.write_text("", encoding="utf-8")
+
+class FileNotes:
+    """Motorun not deposu: NOTES_FILE (masaüstü uygulaması, tek kullanıcı)."""
+
+    def add(self, note: str):
+        save_note(note)
+
+    def last(self, n: int) -> list[str]:
+        return read_notes_last(n)
+
+    def clear(self):
+        clear_notes()
+
+class MemoryNotes:
+    """Sadece bellekte tutulan notlar; sunucuda her oturumun kendi deposu olur,
+    bir istemcinin "notları sil"i başkasının notlarına dokunmaz."""
+
+    def __init__(self, limit: int = 500):
+        self._lines: deque[str] = deque(maxlen=limit)
+
+    def add(self, note: str):
+        self._lines.append(_note_line(note))
+
+    def last(self, n: int) -> list[str]:
+        return list(self._lines)[-n:]
+
+    def clear(self):
+        self._lines.clear()
+
+# son başarılı tahmin servis düşünce yedek cevap olur. Şehir adı sunucuda
+# istemciden geldiği için iki önbellek de sınırlı (en eski önce atılır).
+WEATHER_CACHE_SIZE = 256
+_WEATHER_CACHE: dict[str, tuple[float, str]] = {}
+_WEATHER_LOCK = threading.Lock()   # sunucuda birçok thread yazar
+WEATHER_STALE_S = 12 * 3600   # bundan eski tahmin yedek olarak da söylenmez
+
+def fetch_weather(city: str) -> str:
+    city = (city or "").strip()
+    if not city:
+        return "Şehir bulamadım. 'İstanbul hava durumu' gibi söyleyebilirsin."
+
+    with TRACER.span("fetch_weather", city=city) as sp:
+        try:
+            return _fetch_weather(city, sp)
+        except Exception as e:
+            sp.set(degraded=type(e).__name__)
+            return _weather_fallback(city)
+
+def _weather_fallback(city: str) -> str:
+    cached = _WEATHER_CACHE.get(city)
+    if cached is None or time.time() - cached[0] > WEATHER_STALE_S:
+        return "Hava tahminini alamadım. İnternet bağlantın açık mı?"
+    at = datetime.datetime.fromtimestamp(cached[0]).strftime("%H:%M")
+    return f"Hava servisine şu an ulaşamıyorum. Saat {at} itibarıyla son bilgi: {cached[1]}"
+
+def _meteo_get(http, url: str, params: dict) -> dict:
+    with METEO.call() as timeout:
+        return http.get(url, params=params, timeout=timeout).json()
+
+# şehir koordinatları değişmez; hata (istisna) önbelleğe girmez
+@functools.lru_cache(maxsize=WEATHER_CACHE_SIZE)
+def _geocode(city: str) -> tuple[float, float, str] | None:
+    geo = _meteo_get(HTTP.get(), GEOCODE_URL,
+                     {"name": city, "count": 1, "language": "tr", "format": "json"})
+    results = geo.get("results") or []
+    if not results:
+        return None
+    return results[0]["latitude"], results[0]["longitude"], results[0].get("name", city)
+
+def _fetch_weather(city: str, sp) -> str:
+    place = _geocode(city)
+    sp.mark("geocode")
+    if place is None:
+        return f"'{city}' için konum bulamadım. Başka bir şehir dener misin?"
+    lat, lon, resolved = place
+
+    fc = _meteo_get(HTTP.get(), FORECAST_URL, {
+        "latitude": lat,
+        "longitude": lon,
+        "daily": "temperature_2m_max,temperature_2m_min,precipitation_probability_max",
+        "timezone": "auto"
+    })
+
+    daily = fc.get("daily") or {}
+    tmax = daily.get("temperature_2m_max") or []
+    tmin = daily.get("temperature_2m_min") or []
+    pop = daily.get("precipitation_probability_max") or []
+
+    if not tmax or not tmin:
+        return "Hava tahminini şu an alamadım."
+
+    p = f"%{int(pop[0])}" if pop and pop[0] is not None else "%?"
+    p_say = p.replace("%", "yüzde ")
+    msg = (
+        f"{resolved} için bugün: en düşük {tmin[0]} derece, en yüksek {tmax[0]} derece. "
+        f"Yağış olasılığı {p_say}."
+    )
+    with _WEATHER_LOCK:
+        _WEATHER_CACHE.pop(city, None)
+        _WEATHER_CACHE[city] = (time.time(), msg)
+        if len(_WEATHER_CACHE) > WEATHER_CACHE_SIZE:
+            del _WEATHER_CACHE[next(iter(_WEATHER_CACHE))]
+    return msg
+
+def stt_listen(recognizer: "sr.Recognizer", mic: "sr.Microphone", phrase_time_limit=6) -> str | None:
+    with TRACER.span("stt_listen") as sp:
+        with mic as source:
+            recognizer.adjust_for_ambient_noise(source, duration=0.25)
+            audio = recognizer.listen(source, phrase_time_limit=phrase_time_limit)
+        sp.mark("captured")
+        try:
+            return recognizer.recognize_google(audio, language="tr-TR")
+        except Exception:
+            return None
+
+# =========================
+# Text Normalization
+# =========================
+# Her metin bir kez normalize edilir (normalize_text) ve sonuç cache'lenir;
+# küçük harf, Türkçe-katlanmış ve TTS-temiz biçimler aynı çağrıdan çıkar.
+# Türkçe katlama: tek tek replace, str.translate'ten hızlı (translate ASCII
+# olmayan metinde karakter başına dict araması yapıyor)
+_FOLD_PAIRS = (
+    ("ı", "i"), ("ğ", "g"), ("ş", "s"), ("ö", "o"), ("ü", "u"), ("ç", "c"),
+    ("\u0307", ""),  # "İ".lower() -> "i" + birleşik nokta
+)
+
+# emoji blokları + madde işareti; bitişik bloklar birleştirildi (eski
+# tts_clean'deki tek tek replace'lerin hepsi bu aralıklara düşüyordu)
+_TTS_STRIP_RE = re.compile(
+    "["
+    "•"
+    "\u2600-\u27BF"
+    "\U0001F300-\U0001F64F"
+    "\U0001F680-\U0001FAFF"
+    "]"
+)
+
+@dataclass(frozen=True)
+class NormalizedText:
+    lower: str    # küçük harf, kırpılmış (normalize)
+    folded: str   # Türkçe karakterler ASCII'ye katlanmış (turkish_fold)
+    tts: str      # emoji/madde işaretsiz, tek boşluklu (tts_clean)
+
+@functools.lru_cache(maxsize=1024)
+def normalize_text(text: str) -> NormalizedText:
+    if not text:
+        return NormalizedText("", "", "")
+    lower = text.lower().strip()
+    tts = " ".join(_TTS_STRIP_RE.sub("", text).split())
+    folded = lower
+    for src, dst in _FOLD_PAIRS:
+        if src in folded:
+            folded = folded.replace(src, dst)
+    return NormalizedText(lower, folded, tts)
+
+def turkish_fold(s: str) -> str:
+    return normalize_text(s).folded
+
+def tts_clean(text: str) -> str:
+    return normalize_text(text).tts
+
+# şehirler: uzun isim önce (eski sıralı aramayla aynı tercih), tek regex
+_CITY_BY_FOLD = {turkish_fold(c): c for c in TURKEY_CITIES}
+# şehir adı kelime başında başlar ve ya kelimeyle biter ya da bir hal eki
+# alır (Ankara'da, izmirde, istanbulun); "havanın" içindeki "van" ya da
+# "karşıda"nın başındaki "kars" şehir sayılmaz
+_CITY_RE = re.compile(
+    r"\b(?P<city>" + "|".join(re.escape(f) for f in sorted(_CITY_BY_FOLD, key=len, reverse=True)) + ")"
+    r"(?:'?(?:[dt][ae]n?|y?[ae]|n?[iu]n))?\b"
+)
+
+def find_city_in_text(text: str) -> str | None:
+    found = [m.group("city") for m in _CITY_RE.finditer(turkish_fold(text))]
+    if not found:
+        return None
+    return _CITY_BY_FOLD[max(found, key=len)]
+
+# =========================
+# Neural TTS (edge_tts + pygame)
+# =========================
+def play_speech(text: str, voice: str):
+    """Metni edge_tts ile sentezler, pygame ile çalar ve bitene kadar bekler."""
+    edge_tts, pygame = TTS.get()
+
+    async def _run():
+        fd, filename = tempfile.mkstemp(suffix=".mp3")
+        os.close(fd)
+        try:
+            with TRACER.span("tts_synth", voice=voice, chars=len(text)):
+                await edge_tts.Communicate(text, voice).save(filename)
+            with TRACER.span("tts_play_start"):
+                pygame.mixer.music.load(filename)
+                pygame.mixer.music.play()
+            while pygame.mixer.music.get_busy():
+                time.sleep(0.05)
+        finally:
+            try:
+                pygame.mixer.music.stop()
+            except Exception:
+                pass
+            try:
+                os.remove(filename)
+            except Exception:
+                pass
+
+    try:
+        asyncio.run(_run())
+    except RuntimeError:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(_run())
+        loop.close()
+
+# =========================
+# Ollama Chat (stabil ayarlar)
+# =========================
+def ollama_chat(user_text: str, history: list[dict]) -> str:
+    # akışlı istek: cevap aynı, ama ilk parçanın süresi de ölçülebiliyor
+    return "".join(ollama_chat_stream(user_text, history))
+
+def ollama_chat_stream(user_text: str, history: list[dict]):
+    """Ollama /api/chat isteği; cevap parçaları geldikçe yield edilir."""
+    payload = {
+        "model": OLLAMA_MODEL,
+        "messages": history + [{"role": "user", "content": user_text}],
+        "stream": True,
+        "options": {
+            "temperature": 0.2,
+            "top_p": 0.9,
+            "num_ctx": 4096
+        }
+    }
+    http = HTTP.get()
+    # kesici açıksa ağa çıkmadan ServiceDown; okuma zaman aşımı ilk parçanın
+    # gözlenen süresine göre ayarlanır
+    with TRACER.span("ollama_chat", model=OLLAMA_MODEL) as sp, OLLAMA.call(observe=False) as timeout:
+        t0 = time.perf_counter()
+        with http.post(f"{OLLAMA_URL}/api/chat", json=payload, timeout=timeout, stream=True) as r:
+            sp.mark("response")
+            r.raise_for_status()
+            first = True
+            for line in r.iter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                part = (data.get("message") or {}).get("content")
+                if part:
+                    if first:
+                        sp.mark("first_token")
+                        OLLAMA.latency.observe(time.perf_counter() - t0)
+                        first = False
+                    yield part
+                if data.get("done"):
+                    break
+
+def is_bad_reply(reply: str) -> bool:
+    r = (reply or "").strip().lower()
+    if len(r) < 2:
+        return True
+    if len(r) > 1400:
+        return True
+    bad_signals = [
+        "as an ai", "i'm just", "i cannot", "lorem ipsum",
+        "bunu bilemem ama", "emin değilim ama"
+    ]
+    if any(x in r for x in bad_signals):
+        return True
+    # aşırı alakasız tek kelime/saçma
+    if r in ["tamam", "evet", "hayır", "bilmiyorum"]:
+        return True
+    return False
+
+# =========================
+# Intent Router
+# =========================
+@dataclass(frozen=True)
+class IntentSpec:
+    """Bir niyet, turkish_fold edilmiş metin üzerinde tanımlanır.
+
+    patterns: bir kelime başında eşleşmesi gereken regex parçaları.
+    exact: cümlenin tamamı buna eşitse eşleşir ("kapat", "bugün" gibi).
+    INTENTS listesindeki sıra önceliktir; aynı cümlede birden fazla niyet
+    eşleşirse listede önce gelen kazanır. slots(text) niyete özel alanları
+    (şehir, not metni) çıkarır.
+    """
+    name: str
+    patterns: tuple[str, ...] = ()
+    exact: tuple[str, ...] = ()
+    slots: Callable[[str], dict] | None = None
+
+@dataclass
+class Route:
+    intent: str
+    slots: dict = field(default_factory=dict)
+
+def _city_slot(text: str) -> dict:
+    city = find_city_in_text(text)
+    return {"city": city} if city else {}
+
+_NOTE_BODY_RE = re.compile(r"not al\s*:?\s*(.*)", re.S)
+
+def _note_slot(text: str) -> dict:
+    if ":" in text:
+        note = text.split(":", 1)[1].strip()
+    else:
+        m = _NOTE_BODY_RE.search(text.lower())
+        note = m.group(1).strip(" :") if m else ""
+    return {"note": note}
+
+INTENTS = [
+    IntentSpec("exit", exact=("kapat", "cik", "bitir", "exit", "quit")),
+    # not gövdesi ne içerirse içersin (ör. "not al: notları silmeyi unutma")
+    # not olarak kalsın; yıkıcı notes_clear'ın önünde
+    IntentSpec("note_add", (r"not al\b",), slots=_note_slot),
+    IntentSpec("notes_clear", (r"notlari sil(?:in|sene)?\b",)),
+    IntentSpec("notes_refresh", (r"notlari (?:guncelle|yenile)",), exact=("guncelle",)),
+    # "hava"/"saat"/"tarih" geçen her cümle değil, sadece soru kalıpları ve
+    # ekli biçimleri (havası, havalar, saatin kaç, saati söyler misin);
+    # havalimanı, saatlerce, "saat kulesinin tarihi" sohbete düşer
+    IntentSpec("weather", (r"hava(?:lar|si|nin|yi|da|ya)?\b", r"tahmin"), slots=_city_slot),
+    IntentSpec("time", (r"saat(?:in|ler)? (?:kac|ne)\b", r"saati (?:soyle|soyler|ogren)"),
+               exact=("saat",)),
+    IntentSpec("date", (r"tarih(?:i|imiz)? (?:ne|nedir|kac)\b", r"bugun gunlerden\b"),
+               exact=("bugun", "tarih")),
+    IntentSpec("notes_list", (r"notlar",)),
+    IntentSpec("help", (r"yardim", r"komut")),
+]
+
+class IntentRouter:
+    """INTENTS'i tek bir regex'e ve bir tam-eşleşme sözlüğüne derler.
+
+    Bir cümle tek regex geçişiyle yönlendirilir. Kelime sınırı (\\b) tüm
+    alternatiflerin dışına alındı: re motoru böylece her konumda dokuz
+    alternatifi denemek yerine sadece kelime başlarında dener.
+    """
+
+    def __init__(self, specs: list[IntentSpec], fallback="chat"):
+        self.specs = {s.name: s for s in specs}
+        self.fallback = fallback
+        self._priority = {}
+        self._exact = {}
+        alts = []
+        for rank, spec in enumerate(specs):
+            for phrase in spec.exact:
+                self._exact.setdefault(phrase, (rank, spec.name))
+            if spec.patterns:
+                group = f"i{rank}"
+                self._priority[group] = (rank, spec.name)
+                alts.append(f"(?P<{group}>{'|'.join(spec.patterns)})")
+        # aynı konumda eşleşen alternatiflerden öncelikli olan önce denenir
+        self._re = re.compile(r"\b(?:" + "|".join(alts) + ")")
+
+    def route(self, text: str) -> Route:
+        folded = turkish_fold(text)
+        best = self._exact.get(folded)
+        for m in self._re.finditer(folded):
+            hit = self._priority[m.lastgroup]
+            if best is None or hit < best:
+                best = hit
+        if best is None:
+            return Route(self.fallback)
+        spec = self.specs[best[1]]
+        return Route(spec.name, spec.slots(text) if spec.slots else {})
+
+ROUTER = IntentRouter(INTENTS)
+
+# =========================
+# Assistant Engine (UI'dan bağımsız)
+# =========================
+SYSTEM_PROMPT = (
+    "Sen Lee adında robotik bir dijital asistansın. Kullanıcı Beyza. Türkçe konuş.\n"
+    "Kurallar:\n"
+    "- Kısa, net cevap ver (maks 6-8 cümle).\n"
+    "- Bilmediğin şeyi UYDURMA. Emin değilsen: 'Emin değilim' de ve 1 kısa soru sor.\n"
+    "- Gereksiz emoji kullanma.\n"
+    "- Kullanıcının istediğini netleştirmeden uzun anlatma.\n"
+)
+
+DEFAULT_CITY = "Kahramanmaraş"
+
+LLM_OFFLINE_TEXT = ("Beyin modülüne (Ollama) şu an ulaşamıyorum. Saat, tarih, hava ve "
+                    "not komutları çalışmaya devam ediyor.")
+REPLY_CACHE_SIZE = 128
+
+HELP_TEXT = (
+    "• saat kaç\n"
+    "• tarih ne\n"
+    "• İstanbul hava durumu / Ankara hava tahmini\n"
+    "• not al: ...\n"
+    "• notlar\n"
+    "• notları sil\n"
+    "• güncelle / notları yenile\n"
+    "• kapat\n"
+    "• normal sohbet (Ollama)"
+)
+
+@dataclass
+class Event:
+    """Motorun dışarıya bildirdiği tek bir olay.
+
+    kind: "user", "reply", "typing", "notes_changed", "city", "help", "exit"
+    """
+    kind: str
+    data: dict = field(default_factory=dict)
+
+@dataclass
+class Response:
+    """Bir turun yapılandırılmış sonucu."""
+    intent: str
+    text: str = ""      # ekrana yazılacak cevap
+    speech: str = ""    # seslendirilecek metin
+    events: list[Event] = field(default_factory=list)
+
+class AssistantEngine:
+    """Lee'nin niyet mantığı; Tk'ye ya da ekrana bağımlı değil.
+
+    handle() bir metni işler, olayları sırayla tüm sink'lere iletir ve bir
+    Response döndürür. Sink, emit(event) metodu olan herhangi bir nesnedir.
+    Hava ve LLM çağrıları bloklayıcıdır; UI'lar handle()'ı kendi
+    thread'inde çağırır. Hava/LLM fonksiyonları test ve benchmark için
+    değiştirilebilir.
+    """
+
+    def __init__(self, weather=None, llm=None, city=DEFAULT_CITY, voice=VOICE_MALE, sinks=None,
+                 notes=None):
+        self.weather = weather or fetch_weather
+        self.llm = llm or ollama_chat
+        self.notes = notes or FileNotes()
+        self.city = city
+        self.voice = voice
+        self.sinks = list(sinks or [])
+        self.llm_history = [{"role": "system", "content": SYSTEM_PROMPT}]
+        self._history_lock = threading.Lock()
+        # Ollama düşükken aynı soruya son cevap (katlanmış metin -> cevap, en eski önce)
+        self._reply_cache: dict[str, str] = {}
+        self._handlers = {name: getattr(self, f"_do_{name}") for name in [*ROUTER.specs, ROUTER.fallback]}
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def _emit(self, resp: Response, kind: str, **data):
+        ev = Event(kind, data)
+        resp.events.append(ev)
+        for sink in self.sinks:
+            sink.emit(ev)
+
+    def _reply(self, resp: Response, text: str, speech: str | None = None) -> Response:
+        resp.text = text
+        resp.speech = text if speech is None else speech
+        self._emit(resp, "reply", text=resp.text, speech=resp.speech)
+        return resp
+
+    def handle(self, text: str) -> Response:
+        with TRACER.turn(), TRACER.span("handle_text") as sp:
+            resp = self._handle(text, sp)
+            sp.set(intent=resp.intent)
+            return resp
+
+    def _handle(self, text: str, sp=_NULL_SPAN) -> Response:
+        route = ROUTER.route(text)
+        # handle_text hava/LLM çağrısını da kapsar; yönlendirme payı bu işaretle ayrılır
+        sp.mark("routed")
+        resp = Response(intent=route.intent)
+        self._emit(resp, "user", text=text)
+        return self._handlers[route.intent](resp, text, route.slots)
+
+    # ---------- niyetler ----------
+    def _do_notes_clear(self, resp, text, slots):
+        try:
+            self.notes.clear()
+        except Exception:
+            pass
+        self._emit(resp, "notes_changed")
+        return self._reply(resp, "Tamam. Tüm notları sildim.")
+
+    def _do_notes_refresh(self, resp, text, slots):
+        self._emit(resp, "notes_changed")
+        return self._reply(resp, "Notları güncelledim.")
+
+    def _do_weather(self, resp, text, slots):
+        if slots.get("city"):
+            self.city = slots["city"]
+            self._emit(resp, "city", city=self.city)
+
+        self._emit(resp, "typing", on=True)
+        msg = self.weather(self.city)
+        self._emit(resp, "typing", on=False)
+        return self._reply(resp, msg)
+
+    def _do_time(self, resp, text, slots):
+        now = datetime.datetime.now()
+        return self._reply(resp, f"Şu an saat {now.strftime('%H:%M:%S')}.")
+
+    def _do_date(self, resp, text, slots):
+        now = datetime.datetime.now()
+        return self._reply(resp, f"Bugün {tr_day_name(now)}, {now.strftime('%d.%m.%Y')}.")
+
+    def _do_note_add(self, resp, text, slots):
+        note = slots.get("note")
+        if not note:
+            msg = "Not için 'Not al: ...' şeklinde yazabilirsin."
+        else:
+            self.notes.add(note)
+            self._emit(resp, "notes_changed")
+            msg = f"Not aldım: {note}"
+        return self._reply(resp, msg)
+
+    def _do_notes_list(self, resp, text, slots):
+        lines = self.notes.last(8)
+        msg = "Son notların:\n" + ("\n".join(lines) if lines else "Henüz not yok.")
+        return self._reply(resp, msg, "Notlarını okudum.")
+
+    def _do_exit(self, resp, text, slots):
+        self._reply(resp, "Tamam, görüşürüz.")
+        self._emit(resp, "exit")
+        return resp
+
+    def _do_help(self, resp, text, slots):
+        self._emit(resp, "help", text=HELP_TEXT)
+        return self._reply(resp, "", "Komutları ekrana getirdim.")
+
+    def _do_chat(self, resp, text, slots):
+        # ---------- LLM fallback (Ollama) ----------
+        self._emit(resp, "typing", on=True)
+        reply = self._llm_turn(text)
+        self._emit(resp, "typing", on=False)
+        return self._reply(resp, reply)
+
+    def _llm_turn(self, text: str) -> str:
+        try:
+            with self._history_lock:
+                history = list(self.llm_history)
+            reply = self.llm(text, history)
+
+            # kötü cevap yakala -> 1 kez düzeltme dene
+            if is_bad_reply(reply):
+                fix = ("Cevabın alakasız/uydurma oldu. Uydurma yapma. "
+                       "Emin değilsen 'Emin değilim' de ve 1 kısa soru sor. "
+                       "Kısa net cevap ver.")
+                reply = self.llm(f"{fix}\nKullanıcı: {text}", history)
+
+            # history güncelle (system + son 10 mesaj)
+            with self._history_lock:
+                self.llm_history.append({"role": "user", "content": text})
+                self.llm_history.append({"role": "assistant", "content": reply})
+                self.llm_history = [self.llm_history[0]] + self.llm_history[-10:]
+
+        except ServiceDown:
+            reply = self._cached_reply(text) or LLM_OFFLINE_TEXT
+        except Exception:
+            reply = self._cached_reply(text) or "Beyin modülüne bağlanamadım. Ollama açık mı? (ollama serve)"
+        else:
+            key = normalize_text(text).folded
+            self._reply_cache.pop(key, None)
+            self._reply_cache[key] = reply
+            if len(self._reply_cache) > REPLY_CACHE_SIZE:
+                del self._reply_cache[next(iter(self._reply_cache))]
+        return reply
+
+    def _cached_reply(self, text: str) -> str | None:
+        reply = self._reply_cache.get(normalize_text(text).folded)
+        return f"Şu an Ollama'ya ulaşamıyorum; bunu daha önce sormuştun: {reply}" if reply else None
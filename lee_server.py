@@ -0,0 +1,446 @@
+# lee_server.py
+"""Lee'yi tek makineden birçok kullanıcıya sunan asyncio HTTP/WebSocket sunucusu.
+
+    python lee_server.py --port 8765 --ollama-concurrency 4
+
+Her istemcinin kendi oturumu (LLM geçmişi, seçili şehir, ses, bellekteki
+notlar) vardır. Ollama istekleri FairGate ile sınırlanır; bekleyenler oturumlar
+arasında sırayla (round-robin) ilerler, böylece çok konuşan bir oturum
+diğerlerini aç bırakmaz.
+
+Uç noktalar:
+    GET  /health                 -> {"ok": true, "sessions": n, "services": {"ollama": "closed", ...}}
+    POST /session                -> {"session": id}   (gövde: {"city"?, "voice"?})
+    POST /chat                   -> NDJSON akışı      (gövde: {"session"?, "text", "audio"?})
+    GET  /ws?session=id          -> WebSocket; istemci {"text", "audio"?, "city"?, "voice"?} yollar
+
+Akıştaki olaylar: {"type": "user"|"typing"|"token"|"reply"|"city"|..., ...},
+ses istendiyse {"type": "audio"} (NDJSON'da base64, WebSocket'te ikili frame;
+sentez başarısızsa {"type": "error"}) ve her turun sonunda {"type": "done",
+"intent", "text", "ms"}. LLM cevabı "token" parçaları halinde gelir; kötü cevap
+düzeltmesi olursa parçalar iki kez akabilir, kesin metin "reply"/"done" içindedir.
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import struct
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from urllib.parse import parse_qs, urlsplit
+
+import lee_core
+
+SESSION_TTL = 30 * 60      # sn; bu kadar sessiz kalan oturum silinir
+MAX_BODY = 64 * 1024       # bayt; daha büyük istek gövdesi 400 ile reddedilir
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# =========================
+# Fair queuing (Ollama)
+# =========================
+class FairGate:
+    """En fazla `limit` eşzamanlı iş; bekleyenler anahtar (oturum) bazında round-robin."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._cond = threading.Condition()
+        self._queues: OrderedDict[str, deque] = OrderedDict()
+
+    def _head(self):
+        for q in self._queues.values():
+            return q[0]
+        return None
+
+    @contextmanager
+    def slot(self, key: str):
+        ticket = object()
+        with self._cond:
+            self._queues.setdefault(key, deque()).append(ticket)
+            while self.active >= self.limit or self._head() is not ticket:
+                self._cond.wait()
+            q = self._queues.pop(key)
+            q.popleft()
+            if q:
+                # aynı oturumun sıradaki işi sıranın sonuna
+                self._queues[key] = q
+            self.active += 1
+            # yeni baş bilet, baş olmadan önce uyanıp yeniden uyumuş olabilir;
+            # boş slot varken bir sonraki release'i beklemesin
+            self._cond.notify_all()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.active -= 1
+                self._cond.notify_all()
+
+# =========================
+# Sessions
+# =========================
+class _QueueSink:
+    """Bir turun motor olaylarını (worker thread) o turun asyncio kuyruğuna taşır."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue):
+        self.loop = loop
+        self.queue = queue
+
+    def put(self, payload):
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, payload)
+
+    def emit(self, event: lee_core.Event):
+        self.put({"type": event.kind, **event.data})
+
+# worker thread'inde çalışan turun sink'i; paylaşılan bir alan değil, böylece
+# kopan bir turun geç gelen olayları sonraki turun akışına karışmaz
+_turn_sink: ContextVar[_QueueSink | None] = ContextVar("lee_turn_sink", default=None)
+
+class _TurnSink:
+    """Oturum motorunun tek sink'i: olayı o anki turun _QueueSink'ine iletir."""
+
+    def emit(self, event: lee_core.Event):
+        sink = _turn_sink.get()
+        if sink is not None:
+            sink.emit(event)
+
+class Session:
+    def __init__(self, sid: str, server: "LeeServer", city=None, voice=None):
+        self.id = sid
+        self.server = server
+        self.engine = lee_core.AssistantEngine(
+            llm=self._llm, city=city or lee_core.DEFAULT_CITY,
+            voice=voice or lee_core.VOICE_MALE, sinks=[_TurnSink()],
+            notes=lee_core.MemoryNotes()   # notes.txt masaüstünün; oturumlar paylaşmaz
+        )
+        self.lock = asyncio.Lock()   # bir oturumun turları sırayla
+        self.last_seen = time.monotonic()
+
+    def _llm(self, user_text: str, history: list[dict]) -> str:
+        # Ollama kesicisi açıksa FairGate kuyruğunda beklemeden hemen düş
+        if lee_core.OLLAMA.rejecting:
+            raise lee_core.ServiceDown(lee_core.OLLAMA.name)
+        sink = _turn_sink.get()
+        with self.server.gate.slot(self.id):
+            parts = []
+            for part in self.server.llm_stream(user_text, history):
+                parts.append(part)
+                if sink is not None:
+                    sink.put({"type": "token", "text": part})
+            return "".join(parts)
+
+    async def turn(self, text: str, send_json, send_audio=None):
+        """Bir turu çalıştırır; olayları geldikçe send_json ile yollar."""
+        async with self.lock:
+            self.last_seen = time.monotonic()
+            loop = self.server.loop
+            t0 = time.perf_counter()
+            q = asyncio.Queue()
+
+            def work(sink: _QueueSink):
+                token = _turn_sink.set(sink)
+                try:
+                    return self.engine.handle(text)
+                finally:
+                    _turn_sink.reset(token)
+                    loop.call_soon_threadsafe(q.put_nowait, None)
+
+            fut = loop.run_in_executor(self.server.pool, work, _QueueSink(loop, q))
+            drained = False
+            try:
+                while (msg := await q.get()) is not None:
+                    await send_json(msg)
+                drained = True
+                resp = await fut
+
+                if send_audio is not None and resp.speech:
+                    try:
+                        await self._stream_audio(resp.speech, send_audio)
+                    except ConnectionError:
+                        raise   # istemci gitti; yazacak yer yok
+                    except Exception as e:
+                        # edge_tts ağ hatası turu kesmesin: cevap metni zaten gitti
+                        await send_json({"type": "error", "error": f"audio: {type(e).__name__}"})
+
+                await send_json({"type": "done", "intent": resp.intent, "text": resp.text,
+                                 "ms": round((time.perf_counter() - t0) * 1000, 1)})
+            finally:
+                # istemci tur ortasında koptuysa: kilidi bırakmadan önce worker'ın
+                # bitmesini bekle, aynı motorda iki handle() aynı anda koşmasın
+                if not drained:
+                    while await q.get() is not None:
+                        pass
+                await asyncio.wait([fut])
+                self.last_seen = time.monotonic()
+
+    async def _stream_audio(self, speech: str, send_audio):
+        clean = lee_core.tts_clean(speech)
+        if not clean:
+            return
+        try:
+            import edge_tts
+        except ImportError:
+            return
+        async for chunk in edge_tts.Communicate(clean, self.engine.voice).stream():
+            if chunk["type"] == "audio":
+                await send_audio(chunk["data"])
+
+# =========================
+# Server
+# =========================
+class LeeServer:
+    def __init__(self, ollama_concurrency=4, workers=256, llm_stream=None):
+        self.gate = FairGate(ollama_concurrency)
+        # engine.handle bloklayıcı; her aktif oturuma bir thread yetsin
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="lee-turn")
+        self.llm_stream = llm_stream or lee_core.ollama_chat_stream
+        self.sessions: dict[str, Session] = {}
+        self.loop: asyncio.AbstractEventLoop | None = None
+
+    def session(self, sid=None, city=None, voice=None) -> Session:
+        s = self.sessions.get(sid) if sid else None
+        if s is None:
+            s = Session(sid or uuid.uuid4().hex, self, city, voice)
+            self.sessions[s.id] = s
+        else:
+            if city:
+                s.engine.city = city
+            if voice:
+                s.engine.voice = voice
+        return s
+
+    async def start(self, host="127.0.0.1", port=8765):
+        self.loop = asyncio.get_running_loop()
+        lee_core.HTTP.start()
+        server = await asyncio.start_server(self._client, host, port)
+        self.loop.create_task(self._reaper())
+        return server
+
+    async def _reaper(self):
+        while True:
+            await asyncio.sleep(60)
+            now = time.monotonic()
+            for sid, s in list(self.sessions.items()):
+                if now - s.last_seen > SESSION_TTL and not s.lock.locked():
+                    del self.sessions[sid]
+
+    # ---------- HTTP ----------
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    req = await _read_request(reader)
+                except _BadRequest as e:
+                    await _send_json_response(writer, 400, {"error": str(e)})
+                    break
+                if req is None:
+                    break
+                method, path, headers, body = req
+                url = urlsplit(path)
+                if url.path == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+                    await self._websocket(reader, writer, headers, parse_qs(url.query))
+                    break
+                keep = await self._route(method, url.path, body, writer)
+                if not keep or headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, path, body, writer) -> bool:
+        try:
+            data = json.loads(body) if body else {}
+        except ValueError:
+            await _send_json_response(writer, 400, {"error": "invalid json"})
+            return False
+        if error := _payload_error(data):
+            await _send_json_response(writer, 400, {"error": error})
+            return True
+
+        if method == "GET" and path == "/health":
+            await _send_json_response(writer, 200, {"ok": True, "sessions": len(self.sessions),
+                                                    "services": lee_core.service_states()})
+        elif method == "POST" and path == "/session":
+            s = self.session(city=data.get("city"), voice=data.get("voice"))
+            await _send_json_response(writer, 200, {"session": s.id})
+        elif method == "POST" and path == "/chat":
+            text = (data.get("text") or "").strip()
+            if not text:
+                await _send_json_response(writer, 400, {"error": "text required"})
+                return True
+            s = self.session(data.get("session"), data.get("city"), data.get("voice"))
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                         b"Transfer-Encoding: chunked\r\n\r\n")
+
+            async def send_json(msg):
+                line = (json.dumps({"session": s.id, **msg}, ensure_ascii=False) + "\n").encode("utf-8")
+                writer.write(b"%x\r\n%s\r\n" % (len(line), line))
+                await writer.drain()
+
+            async def send_audio(data):
+                await send_json({"type": "audio", "data": base64.b64encode(data).decode("ascii")})
+
+            await s.turn(text, send_json, send_audio if data.get("audio") else None)
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        else:
+            await _send_json_response(writer, 404, {"error": "not found"})
+        return True
+
+    # ---------- WebSocket ----------
+    async def _websocket(self, reader, writer, headers, query):
+        key = headers.get("sec-websocket-key", "")
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n"
+                      f"Connection: Upgrade\r\nSec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+        await writer.drain()
+
+        s = self.session((query.get("session") or [None])[0])
+
+        async def send_json(msg):
+            await _ws_send(writer, 0x1, json.dumps({"session": s.id, **msg}, ensure_ascii=False).encode("utf-8"))
+
+        async def send_audio(data):
+            await _ws_send(writer, 0x2, data)
+
+        await send_json({"type": "session"})
+        while True:
+            frame = await _ws_recv(reader, writer)
+            if frame is None:
+                break
+            try:
+                data = json.loads(frame)
+            except ValueError:
+                await send_json({"type": "error", "error": "invalid json"})
+                continue
+            if error := _payload_error(data):
+                await send_json({"type": "error", "error": error})
+                continue
+            s = self.session(s.id, data.get("city"), data.get("voice"))
+            text = (data.get("text") or "").strip()
+            if text:
+                await s.turn(text, send_json, send_audio if data.get("audio") else None)
+
+# =========================
+# HTTP / WebSocket yardımcıları
+# =========================
+def _payload_error(data) -> str | None:
+    """İstemci gövdesi bir JSON nesnesi, metin alanları string (ya da yok) olmalı."""
+    if not isinstance(data, dict):
+        return "expected a json object"
+    for key in ("text", "session", "city", "voice"):
+        if data.get(key) is not None and not isinstance(data[key], str):
+            return f"{key} must be a string"
+    return None
+
+class _BadRequest(Exception):
+    """İstek satırı/başlıkları okundu ama gövde kabul edilemez."""
+
+async def _read_request(reader: asyncio.StreamReader):
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, path, _ = line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        return None
+    headers = {}
+    while True:
+        h = await reader.readline()
+        if h in (b"\r\n", b"\n", b""):
+            break
+        k, _, v = h.decode("latin-1").partition(":")
+        headers[k.strip().lower()] = v.strip()
+    try:
+        n = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise _BadRequest("invalid content-length") from None
+    if not 0 <= n <= MAX_BODY:
+        raise _BadRequest(f"body must be 0..{MAX_BODY} bytes")
+    body = await reader.readexactly(n) if n else b""
+    return method, path, headers, body
+
+async def _send_json_response(writer, status: int, obj):
+    body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+    reason = {200: "OK", 400: "Bad Request", 404: "Not Found"}.get(status, "")
+    writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+
+async def _ws_send(writer, opcode: int, payload: bytes):
+    n = len(payload)
+    if n < 126:
+        head = struct.pack("!BB", 0x80 | opcode, n)
+    elif n < 65536:
+        head = struct.pack("!BBH", 0x80 | opcode, 126, n)
+    else:
+        head = struct.pack("!BBQ", 0x80 | opcode, 127, n)
+    writer.write(head + payload)
+    await writer.drain()
+
+async def _ws_recv(reader, writer) -> str | None:
+    """Bir sonraki metin mesajını döndürür; kapanışta None. ping'e pong verir.
+    MAX_BODY'yi aşan frame ya da birleşik mesaj 1009 ile kapatılır."""
+    parts, size = [], 0
+    while True:
+        b1, b2 = await reader.readexactly(2)
+        fin, opcode = b1 & 0x80, b1 & 0x0F
+        n = b2 & 0x7F
+        if n == 126:
+            (n,) = struct.unpack("!H", await reader.readexactly(2))
+        elif n == 127:
+            (n,) = struct.unpack("!Q", await reader.readexactly(8))
+        size += n
+        if n > MAX_BODY or size > MAX_BODY:
+            # 1009: mesaj çok büyük; gövdeyi okumadan kapat
+            await _ws_send(writer, 0x8, struct.pack("!H", 1009))
+            return None
+        mask = await reader.readexactly(4) if b2 & 0x80 else None
+        payload = await reader.readexactly(n)
+        if mask:
+            payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+
+        if opcode == 0x8:
+            await _ws_send(writer, 0x8, b"")
+            return None
+        if opcode in (0x9, 0xA):
+            size -= n   # kontrol frame'i mesaja dahil değil
+            if opcode == 0x9:
+                await _ws_send(writer, 0xA, payload)
+            continue
+        parts.append(payload)
+        if fin:
+            return b"".join(parts).decode("utf-8", "replace")
+
+# =========================
+# Run
+# =========================
+async def serve(host: str, port: int, ollama_concurrency: int):
+    app = LeeServer(ollama_concurrency=ollama_concurrency)
+    server = await app.start(host, port)
+    lee_core.MONITOR.start()
+    print(f"Lee sunucusu: http://{host}:{port}  (Ollama eşzamanlılık: {ollama_concurrency})")
+    async with server:
+        await server.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lee çok oturumlu sunucu")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--ollama-concurrency", type=int, default=4,
+                        help="Ollama'ya aynı anda giden en fazla istek")
+    parser.add_argument("--trace", action="store_true",
+                        help=f"tur aşamalarını {lee_core.TRACE_FILE} dosyasına yaz")
+    args = parser.parse_args()
+    if args.trace:
+        lee_core.TRACER.enable()
+    try:
+        asyncio.run(serve(args.host, args.port, args.ollama_concurrency))
+    except KeyboardInterrupt:
+        pass